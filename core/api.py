@@ -9,6 +9,13 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from database.database import DatabaseManager
 from core.face_recognition import FaceRecognitionHandler
 
+# Explicit columns: face_encoding is a binary blob and not JSON-serializable
+PERSON_COLUMNS = "person_id, name, email, department, shift_start, shift_end, registered_date"
+UNKNOWN_FACE_COLUMNS = "id, timestamp, snapshot_path"
+# DATE/TIME columns come back as date/timedelta; return them as text
+ATTENDANCE_COLUMNS = ("id, person_id, CAST(date AS CHAR) AS date, CAST(arrival_time AS CHAR) AS arrival_time, "
+                      "CAST(leaving_time AS CHAR) AS leaving_time, status")
+
 class AttendanceAPI:
     def __init__(self):
         self.db = DatabaseManager()
@@ -31,7 +38,7 @@ class AttendanceAPI:
         conn = self.db.get_connection()
         cursor = conn.cursor(dictionary=True)
         try:
-            cursor.execute("SELECT * FROM persons WHERE person_id = %s", (person_id,))
+            cursor.execute(f"SELECT {PERSON_COLUMNS} FROM persons WHERE person_id = %s", (person_id,))
             person = cursor.fetchone()
             return person
         except Exception as e:
@@ -48,7 +55,7 @@ class AttendanceAPI:
         conn = self.db.get_connection()
         cursor = conn.cursor(dictionary=True)
         try:
-            cursor.execute("SELECT * FROM persons")
+            cursor.execute(f"SELECT {PERSON_COLUMNS} FROM persons")
             persons = cursor.fetchall()
             return persons
         except Exception as e:
@@ -74,6 +81,16 @@ class AttendanceAPI:
             self.face_handler.remove_face_encoding(person_id)
         return success, msg
 
+    def delete_persons(self, person_ids):
+        """
+        Delete several persons at once (one DB commit, one gallery rebuild).
+        Returns: (success, message)
+        """
+        success, msg = self.db.delete_persons(person_ids)
+        if success:
+            self.face_handler.remove_face_encodings(person_ids)
+        return success, msg
+
     # --- ATTENDANCE DATA ---
 
     def get_today_attendance(self):
@@ -104,7 +121,7 @@ class AttendanceAPI:
         conn = self.db.get_connection()
         cursor = conn.cursor(dictionary=True)
         try:
-            cursor.execute("SELECT * FROM unknown_faces ORDER BY timestamp DESC LIMIT %s", (limit,))
+            cursor.execute(f"SELECT {UNKNOWN_FACE_COLUMNS} FROM unknown_faces ORDER BY timestamp DESC LIMIT %s", (limit,))
             logs = cursor.fetchall()
             return logs
         except Exception as e:
@@ -117,7 +134,7 @@ class AttendanceAPI:
         conn = self.db.get_connection()
         cursor = conn.cursor(dictionary=True)
         try:
-            cursor.execute("SELECT * FROM unknown_faces WHERE id = %s", (record_id,))
+            cursor.execute(f"SELECT {UNKNOWN_FACE_COLUMNS} FROM unknown_faces WHERE id = %s", (record_id,))
             return cursor.fetchone()
         finally:
             conn.close()
@@ -155,7 +172,7 @@ class AttendanceAPI:
         conn = self.db.get_connection()
         cursor = conn.cursor(dictionary=True)
         try:
-            cursor.execute("SELECT * FROM attendance WHERE id = %s", (record_id,))
+            cursor.execute(f"SELECT {ATTENDANCE_COLUMNS} FROM attendance WHERE id = %s", (record_id,))
             return cursor.fetchone()
         finally:
             conn.close()
@@ -1,8 +1,24 @@
+import io
+import os
 import time
-import winsound
-import threading
+import wave
+import tempfile
+import numpy as np
 from core.voice_handler import VoiceSystem  
 
+def _render_beep_wav(frequency=1000, duration=0.5, sample_rate=44100):
+    """Render a sine tone as 16-bit mono WAV bytes"""
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    samples = (0.5 * np.sin(2 * np.pi * frequency * t) * 32767).astype('<i2')
+    
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
 class AttendanceTracker:
     def __init__(self, db_manager, face_handler):
         self.db_manager = db_manager
@@ -15,6 +31,10 @@ class AttendanceTracker:
         self.last_log_time = {}        
         self.last_attendance_time = {} 
         self.last_unknown_alert_time = 0 
+        
+        # Alert tone is synthesized once; written to disk on first use
+        self._beep_wav = _render_beep_wav()
+        self._beep_path = None
     
     def process_recognized_face(self, person_id, person_name):
         """
@@ -24,15 +44,13 @@ class AttendanceTracker:
         current_ts = time.time()
         
         # --- PART 1: RAW LOGGING ---
-        if person_id not in self.last_log_time or \
-           (current_ts - self.last_log_time[person_id] > 10.0):
+        if current_ts - self.last_log_time.get(person_id, 0.0) > 10.0:
             
             self.db_manager.log_raw_detection(person_id, person_name)
             self.last_log_time[person_id] = current_ts
 
         # --- PART 2: ATTENDANCE LOGIC & VOICE ---
-        if person_id not in self.last_attendance_time or \
-           (current_ts - self.last_attendance_time[person_id] > 5.0):
+        if current_ts - self.last_attendance_time.get(person_id, 0.0) > 5.0:
             
             # Perform DB Sync
             msg = self.db_manager.sync_daily_attendance(person_id)
@@ -69,16 +87,29 @@ class AttendanceTracker:
         if current_ts - self.last_unknown_alert_time > 15.0:
             self.last_unknown_alert_time = current_ts
             
-            # Run alert in background to avoid freezing video
-            threading.Thread(target=self._trigger_unknown_alert, daemon=True).start()
+            # Beep and speech both play asynchronously, so this doesn't stall video
+            self._trigger_unknown_alert()
             
         return result
 
+    def _get_beep_path(self):
+        """Write the pre-rendered tone to a temp WAV once and return its path"""
+        if self._beep_path is None:
+            path = os.path.join(tempfile.gettempdir(), 'attendance_alert_beep.wav')
+            with open(path, 'wb') as f:
+                f.write(self._beep_wav)
+            self._beep_path = path
+        return self._beep_path
+
     def _trigger_unknown_alert(self):
         """Play beep and speak warning"""
         try:
-            # Beep: Frequency 1000Hz, Duration 500ms
-            winsound.Beep(1000, 500) 
-            self.voice.speak("Unknown person detected.")
+            # Windows-only module: imported here so the tracker loads everywhere
+            import winsound
+            
+            # Beep: 1000Hz, 500ms, played async (SND_MEMORY can't be async)
+            winsound.PlaySound(self._get_beep_path(), winsound.SND_FILENAME | winsound.SND_ASYNC)
         except Exception as e:
-            print(f"Alert Error: {e}")
\ No newline at end of file
+            print(f"Alert Error: {e}")
+        
+        self.voice.speak("Unknown person detected.")
\ No newline at end of file
@@ -1,12 +1,49 @@
-import cv2
+import sys
 import threading
 import time
+from config.config import CAMERA_FRAME_SIZE, CAMERA_FPS
+
+def open_capture(src=0):
+    """Open a cv2.VideoCapture, asking local webcams for small MJPG frames"""
+    import cv2  # Deferred: importing this module should not load OpenCV
+    
+    if isinstance(src, str) and '!' in src:
+        # GStreamer pipeline (e.g. "... ! nvjpegdec ! ... ! appsink" on
+        # Jetson): decoding happens wherever the pipeline puts it
+        capture = cv2.VideoCapture(src, cv2.CAP_GSTREAMER)
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return capture
+    
+    if not isinstance(src, int):
+        # Streams/files: format and size are decided by the sender
+        capture = cv2.VideoCapture(src)
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return capture
+    
+    # 1. Pick the native backend (the default MSMF negotiates raw YUY2 at
+    #    the driver's default size, often 1080p)
+    if sys.platform == 'win32':
+        capture = cv2.VideoCapture(src, cv2.CAP_DSHOW)
+    elif sys.platform.startswith('linux'):
+        capture = cv2.VideoCapture(src, cv2.CAP_V4L2)
+    else:
+        capture = cv2.VideoCapture(src)
+    
+    # 2. MJPG is compressed in the camera; decoding it at 640x480 is far
+    #    cheaper than converting full-size YUV (drivers ignore what they lack)
+    width, height = CAMERA_FRAME_SIZE
+    capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    capture.set(cv2.CAP_PROP_FPS, CAMERA_FPS)
+    
+    # 3. Buffer size 1 is crucial: it tells the camera to drop old frames
+    capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return capture
 
 class ThreadedCamera:
     def __init__(self, src=0):
-        self.capture = cv2.VideoCapture(src)
-        # Buffer size 1 is crucial: it tells the camera to drop old frames
-        self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.capture = open_capture(src)
         
         self.status = False
         self.frame = None
@@ -39,3 +76,31 @@ class ThreadedCamera:
         self.stopped = True
         self.thread.join()
         self.capture.release()
+
+
+# Cameras shared across registration and attendance, keyed by source.
+# Opening a device can take hundreds of ms (DirectShow/MSMF, RTSP handshake),
+# so each source is opened once and kept until release_shared_cameras().
+_shared_cameras = {}
+_shared_lock = threading.Lock()
+
+def get_shared_camera(src=0):
+    """Return the shared ThreadedCamera for src (callers must not release it)"""
+    with _shared_lock:
+        camera = _shared_cameras.get(src)
+        if camera is not None and camera.isOpened():
+            return camera
+        
+        camera = ThreadedCamera(src)
+        if camera.isOpened():
+            _shared_cameras[src] = camera
+        else:
+            camera.release()
+        return camera
+
+def release_shared_cameras():
+    """Release every shared camera (call once on application exit)"""
+    with _shared_lock:
+        for camera in _shared_cameras.values():
+            camera.release()
+        _shared_cameras.clear()
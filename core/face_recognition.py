@@ -1,42 +1,278 @@
 import numpy as np
-import pickle
+import hashlib
+import json
 import os
-from insightface.app import FaceAnalysis
+import threading
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # ADD THIS LINE at the top to import configuration variables
-from config.config import SIMILARITY_THRESHOLD, FACE_DETECTION_MODEL, DETECTION_SIZE 
+from config.config import SIMILARITY_THRESHOLD, FACE_DETECTION_MODEL, PREVIEW_DETECTION_SIZE
+from config.config import DETECTION_SIZE_LIVE, DETECTION_SIZE_ENROLL
+from config.config import EXECUTION_PROVIDERS, ORT_INTRA_OP_THREADS, QUANTIZE_MIN_GALLERY, HNSW_MIN_GALLERY
+from config.config import FACE_ENCODINGS_PATH, FACE_META_PATH
 # You should also update SIMILARITY_THRESHOLD here if you are using db_manager
+from core.kernels import best_matches
+
+# ArcFace (buffalo_*) embedding length
+EMBEDDING_DIM = 512
+
+# FAISS module, imported by the first index build (None if not installed)
+faiss = None
+_faiss_loaded = False
+
+def _load_faiss():
+    """Import FAISS on first use; returns None when it is not installed"""
+    global faiss, _faiss_loaded
+    if not _faiss_loaded:
+        try:
+            import faiss as module
+        except ImportError:
+            module = None
+        faiss, _faiss_loaded = module, True
+    return faiss
 
 class FaceRecognitionHandler:
     # You can remove similarity_threshold=0.6 from the arguments and use the config value
     def __init__(self, db_manager): 
-        # Initialize InsightFace
-        self.app = FaceAnalysis(
-            # Ensure it uses the variable from config.py
-            name=FACE_DETECTION_MODEL, 
-            providers=['CUDAExecutionProvider', 'CPUExecutionProvider']
-        )
-        
-        # CHANGE THIS LINE: Use the DETECTION_SIZE variable from config.py
-        self.app.prepare(ctx_id=0, det_size=DETECTION_SIZE)
+        # InsightFace is loaded on first use (see _ensure_app) so admin/CLI
+        # flows that never detect faces skip the multi-second import
+        self.app = None
+        self.preview_app = None
+        self._app_lock = threading.Lock()
+        # One handler serves every camera thread: searches and gallery
+        # updates (add/remove/reload) take this lock so a search never pairs
+        # a new index with old ids (re-entrant: append may fall back to rebuild)
+        self._gallery_lock = threading.RLock()
+        # Serializes snapshot writers so their .tmp files never interleave
+        self._snapshot_lock = threading.Lock()
         
         self.db_manager = db_manager
         # Use the config threshold for consistency
         self.similarity_threshold = SIMILARITY_THRESHOLD 
+        # person_id -> MD5 of the stored face_encoding blob, kept in the snapshot
+        # so a re-registered face invalidates it even when id and name are unchanged
+        self._fingerprints = {}
         self.registered_faces = self.load_face_encodings()
+        self._rebuild_index()
 
-
-
-
+    def _stack_encodings(self, faces):
+        """Stack {person_id: {'name', 'encoding'}} into an L2-normalized (N, 512) matrix"""
+        ids, names, encodings = [], [], []
+        for person_id, data in faces.items():
+            encoding = np.asarray(data['encoding'], dtype=np.float32).ravel()
+            if encoding.size != EMBEDDING_DIM:
+                print(f"Skipping encoding for {data['name']} ({person_id}): expected {EMBEDDING_DIM} values, got {encoding.size}")
+                continue
+            ids.append(person_id)
+            names.append(data['name'])
+            encodings.append(encoding)
+        
+        if encodings:
+            matrix = np.stack(encodings)
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        else:
+            matrix = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        return matrix, ids, names
+    
+    def _rebuild_index(self):
+        """Rebuild the embedding matrix (and FAISS index) used for matching"""
+        with self._gallery_lock:
+            faces = dict(self.registered_faces)
+        matrix, ids, names = self._stack_encodings(faces)
+        
+        # Inner product on unit vectors == cosine similarity
+        index = None
+        if _load_faiss() is not None and len(ids) > 0:
+            index = self._new_index(len(ids))
+            if not index.is_trained:
+                index.train(matrix)
+            index.add(matrix)
+        
+        # Built off to the side, swapped in together
+        with self._gallery_lock:
+            self._emb_matrix = matrix
+            self._ids = ids
+            self._names = names
+            self._rows = {person_id: row for row, person_id in enumerate(ids)}
+            self._index = index
+    
+    def _index_kind(self, count):
+        """Which FAISS index suits a gallery of this size"""
+        if count >= HNSW_MIN_GALLERY:
+            return 'hnsw'
+        if count >= QUANTIZE_MIN_GALLERY:
+            return 'sq8'
+        return 'flat'
+    
+    def _new_index(self, count):
+        """Empty FAISS index for a gallery of this size"""
+        kind = self._index_kind(count)
+        if kind == 'hnsw':
+            # Graph search: ~log(N) distance evaluations instead of N
+            index = faiss.IndexHNSWFlat(EMBEDDING_DIM, 32, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efSearch = 64
+        elif kind == 'sq8':
+            # int8 codes: 4x less memory traffic per search on big galleries.
+            # Trades a little accuracy for search speed only: the float32
+            # matrix is kept too (verify_face, snapshot), so memory goes up
+            index = faiss.IndexScalarQuantizer(
+                EMBEDDING_DIM, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+            )
+        else:
+            index = faiss.IndexFlatIP(EMBEDDING_DIM)
+        return index
+    
+    def _append_to_index(self, person_id, name, face_encoding):
+        """Add one new person without restacking the whole gallery"""
+        row = np.asarray(face_encoding, dtype=np.float32).reshape(1, -1)
+        if row.shape[1] != EMBEDDING_DIM or self._index_kind(len(self._ids)) != self._index_kind(len(self._ids) + 1):
+            self._rebuild_index()
+            return
+        row = row / np.linalg.norm(row)
+        
+        with self._gallery_lock:
+            self._emb_matrix = np.vstack([self._emb_matrix, row])
+            self._ids.append(person_id)
+            self._names.append(name)
+            self._rows[person_id] = len(self._ids) - 1
+            
+            if faiss is not None:
+                if self._index is None:
+                    self._index = self._new_index(len(self._ids))
+                    if not self._index.is_trained:
+                        self._index.train(self._emb_matrix)
+                self._index.add(row)
+    
+    def _search(self, queries):
+        """Return the best-matching row and its similarity for each normalized query"""
+        if self._index is not None:
+            similarities, indices = self._index.search(queries, 1)
+            return indices[:, 0], similarities[:, 0]
+        
+        return best_matches(self._emb_matrix, queries)
+    
+    def _match(self, encodings):
+        """Match a batch of encodings. Returns a list of (person_id, name, similarity)"""
+        if len(self._ids) == 0 or len(encodings) == 0:
+            return [(None, None, 0.0)] * len(encodings)
+        
+        queries = np.stack([np.asarray(e, dtype=np.float32).ravel() for e in encodings])
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        
+        results = []
+        with self._gallery_lock:
+            best, similarities = self._search(queries)
+            for row, similarity in zip(best, similarities):
+                similarity = float(similarity)
+                if similarity > self.similarity_threshold:
+                    results.append((self._ids[row], self._names[row], similarity))
+                else:
+                    # Below threshold reads as "no match", not a weak score
+                    results.append((None, None, 0.0))
+        return results
+    
+    def _create_app(self, det_size, allowed_modules=None):
+        """Import and prepare an InsightFace pipeline"""
+        from insightface.app import FaceAnalysis
+        
+        app = FaceAnalysis(
+            # Ensure it uses the variable from config.py
+            name=FACE_DETECTION_MODEL, 
+            allowed_modules=allowed_modules,
+            providers=EXECUTION_PROVIDERS
+        )
+        app.prepare(ctx_id=0, det_size=det_size)
+        self._tune_cpu_sessions(app)
+        return app
+    
+    def _tune_cpu_sessions(self, app):
+        """Recreate CPU-only ONNX sessions with explicit threading/graph options"""
+        # FaceAnalysis doesn't forward SessionOptions, so rebuild the sessions
+        # that fell back to CPU (GPU sessions are left untouched)
+        import onnxruntime as ort
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = ORT_INTRA_OP_THREADS or max(1, (os.cpu_count() or 2) // 2)
+        
+        for model in app.models.values():
+            if 'CUDAExecutionProvider' in model.session.get_providers():
+                continue
+            model.session = ort.InferenceSession(
+                model.model_file, sess_options=options, providers=['CPUExecutionProvider']
+            )
+    
+    def warm_up(self):
+        """Load the full pipeline now, e.g. on a background thread at startup,
+        so the first detection or registration does not block on it"""
+        try:
+            self._ensure_app()
+        except Exception as e:
+            # First real use retries and reports the error to its caller
+            print(f"Face model warm-up failed: {e}")
+    
+    def _ensure_app(self):
+        """Full pipeline (detection + landmarks + embedding), loaded on first use"""
+        if self.app is None:
+            with self._app_lock:
+                if self.app is None:
+                    self.app = self._create_app(DETECTION_SIZE_LIVE)
+        return self.app
+    
+    def _ensure_preview_app(self):
+        """Detector-only pipeline at PREVIEW_DETECTION_SIZE, loaded on first use"""
+        if self.preview_app is None:
+            with self._app_lock:
+                if self.preview_app is None:
+                    self.preview_app = self._create_app(PREVIEW_DETECTION_SIZE, allowed_modules=['detection'])
+        return self.preview_app
+    
+    def _analyze(self, frame, det_size):
+        """Same as FaceAnalysis.get(), but with a per-call detector input size
+        and one batched ArcFace run for all faces in the frame"""
+        from insightface.app.common import Face
+        from insightface.utils import face_align
+        
+        app = self._ensure_app()
+        bboxes, kpss = app.det_model.detect(frame, input_size=det_size, max_num=0, metric='default')
+        
+        faces = []
+        for i in range(bboxes.shape[0]):
+            face = Face(bbox=bboxes[i, 0:4], kps=kpss[i] if kpss is not None else None,
+                        det_score=bboxes[i, 4])
+            for taskname, model in app.models.items():
+                if taskname not in ('detection', 'recognition'):
+                    model.get(frame, face)
+            faces.append(face)
+        
+        # Embeddings: align every face, then a single (N, 3, 112, 112) forward
+        # pass instead of N batch-1 runs (ArcFaceONNX.get does one face at a time)
+        rec_model = app.models.get('recognition')
+        if rec_model is not None and faces and kpss is not None:
+            crops = [face_align.norm_crop(frame, landmark=face.kps, image_size=rec_model.input_size[0])
+                     for face in faces]
+            embeddings = rec_model.get_feat(crops)
+            for face, embedding in zip(faces, embeddings):
+                face.embedding = embedding
+        return faces
     
     def detect_faces(self, frame):
-        """Detect faces in a frame"""
-        faces = self.app.get(frame)
+        """Detect faces in a frame (live recognition, DETECTION_SIZE_LIVE)"""
+        faces = self._analyze(frame, DETECTION_SIZE_LIVE)
         return faces
     
+    def detect_faces_preview(self, frame):
+        """Fast detection for live previews (bbox + 5 keypoints, no embedding)"""
+        return self._ensure_preview_app().get(frame)
+    
     def extract_face_encoding(self, frame):
-        """Extract face encoding from a frame"""
-        faces = self.app.get(frame)
+        """Extract face encoding from a frame (enrollment, DETECTION_SIZE_ENROLL)"""
+        faces = self._analyze(frame, DETECTION_SIZE_ENROLL)
         
         if len(faces) == 0:
             return None, "No face detected"
@@ -47,57 +283,129 @@ class FaceRecognitionHandler:
         return faces[0].embedding, "Face encoding extracted successfully"
     
     def load_face_encodings(self):
-        """Load face encodings from database"""
-        return self.db_manager.get_all_face_encodings()
+        """Load face encodings, using the local snapshot when it matches the database"""
+        persons = self.db_manager.get_face_encoding_ids()
+        snapshot = self._load_snapshot()
+        fingerprints = {person_id: digest for person_id, _, digest in persons or ()}
+        
+        if persons is not None and snapshot is not None:
+            matrix, ids, names, digests = snapshot
+            if set(map(tuple, persons)) == set(zip(ids, names, digests)):
+                self._fingerprints = fingerprints
+                return {
+                    person_id: {'name': name, 'encoding': matrix[i]}
+                    for i, (person_id, name) in enumerate(zip(ids, names))
+                }
+        
+        # Snapshot missing or stale: decode from the database and refresh it
+        faces = self.db_manager.get_all_face_encodings()
+        self._fingerprints = fingerprints
+        matrix, ids, names = self._stack_encodings(faces)
+        self._write_snapshot(matrix, ids, names, [fingerprints.get(person_id) for person_id in ids])
+        return faces
+    
+    def save_face_encodings(self):
+        """Persist the in-memory gallery to the local snapshot"""
+        # Take one consistent gallery version; _append_to_index grows the lists in place
+        with self._gallery_lock:
+            matrix, ids, names = self._emb_matrix, list(self._ids), list(self._names)
+            digests = [self._fingerprints.get(person_id) for person_id in ids]
+        self._write_snapshot(matrix, ids, names, digests)
+    
+    def _load_snapshot(self):
+        """Read the (matrix, ids, names, fingerprints) snapshot. Returns None if missing or corrupt"""
+        if not (os.path.exists(FACE_ENCODINGS_PATH) and os.path.exists(FACE_META_PATH)):
+            return None
+        
+        try:
+            matrix = np.load(FACE_ENCODINGS_PATH)
+            with open(FACE_META_PATH, 'rb') as f:
+                raw = f.read()
+            meta = orjson.loads(raw) if orjson is not None else json.loads(raw)
+            ids, names, digests = meta['ids'], meta['names'], meta['fingerprints']
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring face encodings snapshot: {e}")
+            return None
+        
+        if matrix.shape != (len(ids), EMBEDDING_DIM) or len(names) != len(ids) or len(digests) != len(ids):
+            return None
+        return matrix, ids, names, digests
+    
+    def _write_snapshot(self, matrix, ids, names, digests):
+        """Atomically write the snapshot (write .tmp files, then os.replace)"""
+        meta = {'ids': ids, 'names': names, 'fingerprints': digests}
+        try:
+            with self._snapshot_lock:
+                os.makedirs(os.path.dirname(FACE_ENCODINGS_PATH) or '.', exist_ok=True)
+                with open(FACE_ENCODINGS_PATH + '.tmp', 'wb') as f:
+                    np.save(f, np.ascontiguousarray(matrix, dtype=np.float32))
+                with open(FACE_META_PATH + '.tmp', 'wb') as f:
+                    f.write(orjson.dumps(meta) if orjson is not None else json.dumps(meta).encode('utf-8'))
+                
+                os.replace(FACE_ENCODINGS_PATH + '.tmp', FACE_ENCODINGS_PATH)
+                os.replace(FACE_META_PATH + '.tmp', FACE_META_PATH)
+        except OSError as e:
+            print(f"Could not save face encodings snapshot: {e}")
     
     def add_face_encoding(self, person_id, name, face_encoding):
         """Add a face encoding to the in-memory database"""
-        self.registered_faces[person_id] = {
-            'name': name,
-            'encoding': face_encoding
-        }
+        with self._gallery_lock:
+            is_new = person_id not in self.registered_faces
+            self.registered_faces[person_id] = {
+                'name': name,
+                'encoding': face_encoding
+            }
+            # Same bytes the database stores, so this equals its MD5(face_encoding)
+            self._fingerprints[person_id] = hashlib.md5(
+                np.asarray(face_encoding, dtype='<f4').ravel().tobytes()).hexdigest()
+        
+        # Re-registering an existing id replaces its row, which needs a rebuild
+        if is_new:
+            self._append_to_index(person_id, name, face_encoding)
+        else:
+            self._rebuild_index()
+        self.save_face_encodings()
         return True
     
     def remove_face_encoding(self, person_id):
         """Remove a face encoding from the database"""
-        if person_id in self.registered_faces:
-            del self.registered_faces[person_id]
-            return True
-        return False
+        return self.remove_face_encodings([person_id]) > 0
+    
+    def remove_face_encodings(self, person_ids):
+        """Remove several face encodings with one index rebuild and one snapshot write.
+        Returns how many were removed"""
+        removed = 0
+        with self._gallery_lock:
+            for person_id in person_ids:
+                if self.registered_faces.pop(person_id, None) is not None:
+                    self._fingerprints.pop(person_id, None)
+                    removed += 1
+        if removed:
+            self._rebuild_index()
+            self.save_face_encodings()
+        return removed
     
     def calculate_similarity(self, encoding1, encoding2):
         """Calculate cosine similarity between two face encodings"""
-        similarity = np.dot(encoding1, encoding2) / (
-            np.linalg.norm(encoding1) * np.linalg.norm(encoding2)
-        )
-        return similarity
+        pair = np.stack([np.asarray(encoding1, dtype=np.float32).ravel(),
+                         np.asarray(encoding2, dtype=np.float32).ravel()])
+        pair /= np.linalg.norm(pair, axis=1, keepdims=True)
+        return float(np.dot(pair[0], pair[1]))
     
     def recognize_face(self, face_encoding):
         """Recognize a face by comparing with registered faces"""
-        if len(self.registered_faces) == 0:
+        query = np.asarray(face_encoding, dtype=np.float32).ravel()
+        if len(self._ids) == 0 or query.size != EMBEDDING_DIM:
             return None, None, 0.0
         
-        max_similarity = 0.0
-        recognized_id = None
-        recognized_name = None
-        
-        for person_id, data in self.registered_faces.items():
-            similarity = self.calculate_similarity(face_encoding, data['encoding'])
-            
-            if similarity > max_similarity and similarity > self.similarity_threshold:
-                max_similarity = similarity
-                recognized_id = person_id
-                recognized_name = data['name']
-        
-        return recognized_id, recognized_name, max_similarity
+        return self._match([query])[0]
     
     def recognize_multiple_faces(self, faces):
-        """Recognize multiple faces in a frame"""
+        """Recognize multiple faces in a frame (one batched search for all faces)"""
+        matches = self._match([face.embedding for face in faces])
         recognized_faces = []
         
-        for face in faces:
-            person_id, person_name, similarity = self.recognize_face(face.embedding)
-            
+        for face, (person_id, person_name, similarity) in zip(faces, matches):
             recognized_faces.append({
                 'bbox': face.bbox,
                 'person_id': person_id,
@@ -111,13 +419,16 @@ class FaceRecognitionHandler:
     
     def verify_face(self, person_id, face_encoding):
         """Verify if a face encoding matches a specific person"""
-        if person_id not in self.registered_faces:
-            return False, 0.0
+        # Row lookup and matrix read must see the same gallery version
+        with self._gallery_lock:
+            row = self._rows.get(person_id)
+            if row is None:
+                return False, 0.0
+            stored = self._emb_matrix[row]
         
-        similarity = self.calculate_similarity(
-            face_encoding, 
-            self.registered_faces[person_id]['encoding']
-        )
+        # Stored rows are already unit length; only the query needs normalizing
+        query = np.asarray(face_encoding, dtype=np.float32).ravel()
+        similarity = float(np.dot(stored, query) / np.linalg.norm(query))
         
         is_match = similarity > self.similarity_threshold
         return is_match, similarity
@@ -132,7 +443,10 @@ class FaceRecognitionHandler:
     
     def reload_face_encodings(self):
         """Reload face encodings from database"""
-        self.registered_faces = self.load_face_encodings()
+        faces = self.load_face_encodings()
+        with self._gallery_lock:
+            self.registered_faces = faces
+        self._rebuild_index()
         return len(self.registered_faces)
     
     def update_similarity_threshold(self, new_threshold):
@@ -0,0 +1,47 @@
+import numba
+import numpy as np
+
+# numba-compiled kernels behind core/kernels.py; only imported (and numba
+# with it) on the first kernel call or kernels.warm_up()
+
+
+@numba.njit(cache=True, fastmath=True)
+def _best_matches_jit(matrix, queries):
+    n_queries = queries.shape[0]
+    n_rows, dim = matrix.shape
+    best = np.zeros(n_queries, dtype=np.int64)
+    best_sim = np.full(n_queries, -np.inf, dtype=np.float32)
+    for q in range(n_queries):
+        for i in range(n_rows):
+            sim = np.float32(0.0)
+            for k in range(dim):
+                sim += matrix[i, k] * queries[q, k]
+            if sim > best_sim[q]:
+                best_sim[q] = sim
+                best[q] = i
+    return best, best_sim
+
+
+def best_matches(matrix, queries):
+    """Best row of matrix (N, D) for each query (Q, D) by inner product -> (rows, similarities)"""
+    # Fused dot + argmax: no (Q, N) similarity matrix is materialized
+    return _best_matches_jit(np.ascontiguousarray(matrix, dtype=np.float32),
+                             np.ascontiguousarray(queries, dtype=np.float32))
+
+
+@numba.njit(cache=True)
+def _assign_tracks_jit(iou_matrix, thresh):
+    n_tracks, n_faces = iou_matrix.shape
+    out = np.full(n_tracks, -1, dtype=np.int64)
+    for t in range(n_tracks):
+        best_iou = thresh
+        for f in range(n_faces):
+            if iou_matrix[t, f] > best_iou:
+                best_iou = iou_matrix[t, f]
+                out[t] = f
+    return out
+
+
+def assign_tracks(iou_matrix, thresh=0.5):
+    """Best face index per track (row), or -1 when its best IoU is <= thresh"""
+    return _assign_tracks_jit(np.ascontiguousarray(iou_matrix, dtype=np.float64), float(thresh))
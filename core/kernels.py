@@ -0,0 +1,58 @@
+import numpy as np
+
+# JIT (numba) implementations, or the NumPy fallbacks when numba is not
+# installed. Resolved on first use: importing numba takes about a second,
+# so it is not paid at import time (see warm_up for the explicit path)
+_impl = None
+
+
+def _assign_tracks_numpy(iou_matrix, thresh=0.5):
+    """Best face index per track (row), or -1 when its best IoU is <= thresh"""
+    if iou_matrix.shape[1] == 0:
+        return np.full(iou_matrix.shape[0], -1, dtype=np.int64)
+    best = iou_matrix.argmax(axis=1)
+    best_iou = iou_matrix[np.arange(len(best)), best]
+    return np.where(best_iou > thresh, best, -1).astype(np.int64)
+
+
+def _best_matches_numpy(matrix, queries):
+    """Best row of matrix (N, D) for each query (Q, D) by inner product -> (rows, similarities)"""
+    similarities = queries @ matrix.T
+    best = similarities.argmax(axis=1)
+    return best, similarities[np.arange(len(queries)), best]
+
+
+def _kernels():
+    """The module providing assign_tracks / best_matches, imported once"""
+    global _impl
+    if _impl is None:
+        try:
+            from core import jit_kernels as impl  # Optional: numba
+        except ImportError:
+            impl = None
+        _impl = impl or False
+    return _impl
+
+
+def assign_tracks(iou_matrix, thresh=0.5):
+    """Best face index per track (row), or -1 when its best IoU is <= thresh"""
+    impl = _kernels()
+    if impl:
+        return impl.assign_tracks(iou_matrix, thresh)
+    return _assign_tracks_numpy(iou_matrix, thresh)
+
+
+def best_matches(matrix, queries):
+    """Best row of matrix (N, D) for each query (Q, D) by inner product -> (rows, similarities)"""
+    impl = _kernels()
+    if impl:
+        return impl.best_matches(matrix, queries)
+    return _best_matches_numpy(matrix, queries)
+
+
+def warm_up():
+    """Import numba and compile (or load from cache) the JIT kernels before the first frame"""
+    if not _kernels():
+        return
+    assign_tracks(np.zeros((1, 1), dtype=np.float64))
+    best_matches(np.zeros((1, 1), dtype=np.float32), np.zeros((1, 1), dtype=np.float32))
@@ -1,6 +1,16 @@
-import cv2
-from database.database import DatabaseManager
-from core.face_recognition import FaceRecognitionHandler
+import time
+from config.config import REGISTRATION_CAPTURE_KEY, REGISTRATION_CANCEL_KEY, CAMERA_STALL_TIMEOUT
+
+# Key codes compared against cv2.pollKey() every frame
+CAPTURE_KEY = ord(REGISTRATION_CAPTURE_KEY)
+CANCEL_KEY = ord(REGISTRATION_CANCEL_KEY)
+
+# Preview status by face count: none / single / multiple
+PREVIEW_STATUS = (
+    ("No face detected", (0, 0, 255)),  # Red
+    (f"Face detected - Press '{REGISTRATION_CAPTURE_KEY}' to capture", (0, 255, 0)),  # Green
+    ("Multiple faces detected - Only one person allowed", (0, 165, 255)),  # Orange
+)
 
 class RegistrationModule:
     def __init__(self, db_manager, face_handler):
@@ -9,7 +19,13 @@ class RegistrationModule:
     
     def register_person_from_webcam(self, person_id, name, email=None, department=None):
         """Register a person using webcam capture"""
-        cap = cv2.VideoCapture(0)
+        import cv2
+        from core.camera import get_shared_camera
+        
+        # Capture runs on its own thread so inference never waits on the
+        # webcam and always sees the newest frame. The camera is shared and
+        # stays open after registration, so it is not released here.
+        cap = get_shared_camera(0)
         
         if not cap.isOpened():
             return False, "Could not open webcam"
@@ -27,32 +43,43 @@ class RegistrationModule:
         
         face_captured = False
         face_encoding = None
+        read_failed = False
+        last_frame = None
+        last_frame_time = time.time()
+        info_text = f"Name: {name} | ID: {person_id}"
         
         while True:
             ret, frame = cap.read()
-            if not ret:
-                break
+            if not ret or frame is None or frame is last_frame:
+                # First frame not grabbed yet, or no new frame since the last
+                # one. Give up if the camera stalls, and keep the cancel key
+                # responsive.
+                if time.time() - last_frame_time > CAMERA_STALL_TIMEOUT:
+                    print("Error: Cannot read from webcam")
+                    read_failed = True
+                    break
+                if cv2.pollKey() & 0xFF == CANCEL_KEY:
+                    print("Registration cancelled by user")
+                    break
+                time.sleep(0.005)
+                continue
+            last_frame = frame
+            last_frame_time = time.time()
             
-            # Detect faces in real-time
-            faces = self.face_handler.detect_faces(frame)
+            # Detect faces in real-time (cheap detector-only pass; the
+            # embedding is computed once, on capture)
+            faces = self.face_handler.detect_faces_preview(frame)
             
-            # Draw rectangles around detected faces
-            display_frame = frame.copy()
+            # Draw on a copy: the shared camera hands this same array to the
+            # attendance pipeline, and the capture below embeds the clean frame
+            display = frame.copy()
+            status_text, color = PREVIEW_STATUS[min(len(faces), 2)]
             
-            if len(faces) == 0:
-                status_text = "No face detected"
-                color = (0, 0, 255)  # Red
-            elif len(faces) > 1:
-                status_text = "Multiple faces detected - Only one person allowed"
-                color = (0, 165, 255)  # Orange
-            else:
-                status_text = "Face detected - Press 'c' to capture"
-                color = (0, 255, 0)  # Green
-                
+            if len(faces) == 1:
                 # Draw bounding box
                 face = faces[0]
                 bbox = face.bbox.astype(int)
-                cv2.rectangle(display_frame, 
+                cv2.rectangle(display, 
                             (bbox[0], bbox[1]), 
                             (bbox[2], bbox[3]), 
                             color, 2)
@@ -60,39 +87,43 @@ class RegistrationModule:
                 # Draw landmarks
                 if hasattr(face, 'kps') and face.kps is not None:
                     for point in face.kps:
-                        cv2.circle(display_frame, 
+                        cv2.circle(display, 
                                  (int(point[0]), int(point[1])), 
                                  3, (0, 255, 255), -1)
             
             # Display status
-            cv2.putText(display_frame, status_text, (10, 30),
+            cv2.putText(display, status_text, (10, 30),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
             
             # Display person info
-            info_text = f"Name: {name} | ID: {person_id}"
-            cv2.putText(display_frame, info_text, (10, 60),
+            cv2.putText(display, info_text, (10, 60),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
             
-            cv2.imshow("Registration - Face Capture", display_frame)
+            cv2.imshow("Registration - Face Capture", display)
             
-            key = cv2.waitKey(1) & 0xFF
+            # Non-blocking: the loop already sleeps while no new frame is available
+            key = cv2.pollKey() & 0xFF
             
-            if key == ord('c'):
+            if key == CAPTURE_KEY:
                 if len(faces) == 1:
-                    face_encoding = faces[0].embedding
-                    face_captured = True
-                    print("✓ Face captured successfully!")
-                    break
+                    # Full-resolution pass for the embedding that gets stored
+                    face_encoding, message = self.face_handler.extract_face_encoding(frame)
+                    if face_encoding is not None:
+                        face_captured = True
+                        print("✓ Face captured successfully!")
+                        break
+                    print(f"✗ Cannot capture: {message}")
                 else:
                     print("✗ Cannot capture: Ensure only one face is visible")
             
-            elif key == ord('q'):
+            elif key == CANCEL_KEY:
                 print("Registration cancelled by user")
                 break
         
-        cap.release()
         cv2.destroyAllWindows()
         
+        if read_failed:
+            return False, "Cannot read from webcam"
         if not face_captured:
             return False, "Face capture cancelled or failed"
         
@@ -113,6 +144,8 @@ class RegistrationModule:
     def register_person_from_image(self, person_id, name, image_path, 
                                    email=None, department=None):
         """Register a person from an image file"""
+        import cv2
+        
         # Read image
         frame = cv2.imread(image_path)
         
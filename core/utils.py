@@ -1,9 +1,91 @@
 import os
+import re
+import atexit
 import shutil
+import threading
+import time
 from datetime import datetime, date, timedelta
 import csv
 import json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _hms_to_seconds(time_str):
+    """Parse 'HH:MM:SS' into seconds since midnight (raises ValueError if malformed)"""
+    hours, minutes, seconds = time_str.split(':')
+    hours, minutes, seconds = int(hours), int(minutes), int(seconds)
+    if not (0 <= hours < 24 and 0 <= minutes < 60 and 0 <= seconds < 60):
+        raise ValueError(f"Invalid time: {time_str}")
+    return hours * 3600 + minutes * 60 + seconds
+
+def _duration_seconds(arrival_time, leaving_time):
+    """Seconds between arrival and leaving, or None if either is missing/malformed"""
+    if not arrival_time or not leaving_time:
+        return None
+    try:
+        # Wraps past midnight like timedelta.seconds did
+        return (_hms_to_seconds(leaving_time) - _hms_to_seconds(arrival_time)) % 86400
+    except (ValueError, AttributeError):
+        return None
+
+# Letters, digits and underscore, with at least one non-underscore
+# (same as the old replace('_', '').isalnum() check)
+_PERSON_ID_RE = re.compile(r'\w*[^\W_]\w*')
+
+# user@domain.tld with no whitespace and exactly one '@'
+_EMAIL_RE = re.compile(r'[^@\s]+@[^@\s]+\.[^@\s]+')
+
+# Open log files, kept for the life of the process (see Utils.log_event)
+_log_files = {}
+_log_lock = threading.Lock()
+
+def _close_log_files():
+    """Flush and close every log handle opened by log_event"""
+    with _log_lock:
+        for handle in _log_files.values():
+            handle.close()
+        _log_files.clear()
+
+atexit.register(_close_log_files)
+
+# (second, formatted string) for the last log_event call
+_log_stamp = (None, '')
+
+def _log_timestamp():
+    """'%Y-%m-%d %H:%M:%S' for now, formatted at most once per second"""
+    global _log_stamp
+    second = int(time.time())
+    if second != _log_stamp[0]:
+        _log_stamp = (second, time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(second)))
+    return _log_stamp[1]
+
+_FICLONE = 0x40049409  # Linux ioctl: copy-on-write clone of a whole file
+
+def _fast_copy(src, dst):
+    """copy2 that tries a reflink, then in-kernel copy_file_range, on Linux"""
+    if hasattr(os, 'copy_file_range'):
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                try:
+                    import fcntl
+                    fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+                except OSError:
+                    # Filesystem without CoW support: copy without user-space buffers
+                    remaining = os.fstat(fsrc.fileno()).st_size
+                    while remaining > 0:
+                        copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                        if copied == 0:
+                            break
+                        remaining -= copied
+            shutil.copystat(src, dst)
+            return
+        except OSError:
+            pass  # e.g. cross-device on older kernels; use the portable path
+    shutil.copy2(src, dst)
+
 class Utils:
     """Utility functions for the attendance system"""
     
@@ -29,7 +111,7 @@ class Utils:
         backup_file = os.path.join(backup_folder, f'attendance_backup_{timestamp}.db')
         
         try:
-            shutil.copy2(db_path, backup_file)
+            _fast_copy(db_path, backup_file)
             return True, f"Backup created: {backup_file}"
         except Exception as e:
             return False, f"Backup failed: {str(e)}"
@@ -47,8 +129,9 @@ class Utils:
     def format_time(time_str):
         """Format time string to readable format"""
         try:
-            time_obj = datetime.strptime(time_str, '%H:%M:%S')
-            return time_obj.strftime('%I:%M %p')
+            total = _hms_to_seconds(time_str)
+            hours, minutes = total // 3600, (total % 3600) // 60
+            return f"{hours % 12 or 12:02d}:{minutes:02d} {'AM' if hours < 12 else 'PM'}"
         except:
             return time_str
     
@@ -58,17 +141,14 @@ class Utils:
         if not arrival_time or not leaving_time:
             return "N/A"
         
-        try:
-            arrival = datetime.strptime(arrival_time, '%H:%M:%S')
-            leaving = datetime.strptime(leaving_time, '%H:%M:%S')
-            duration = leaving - arrival
-            
-            hours = duration.seconds // 3600
-            minutes = (duration.seconds % 3600) // 60
-            
-            return f"{hours}h {minutes}m"
-        except:
+        duration = _duration_seconds(arrival_time, leaving_time)
+        if duration is None:
             return "Error"
+        
+        hours = duration // 3600
+        minutes = (duration % 3600) // 60
+        
+        return f"{hours}h {minutes}m"
     
     @staticmethod
     def get_date_range(days_back=7):
@@ -90,7 +170,7 @@ class Utils:
             return False, "Person ID must be less than 20 characters"
         
         # Only alphanumeric and underscore
-        if not person_id.replace('_', '').isalnum():
+        if not _PERSON_ID_RE.fullmatch(person_id):
             return False, "Person ID can only contain letters, numbers, and underscores"
         
         return True, "Valid"
@@ -101,17 +181,19 @@ class Utils:
         if not email:
             return True  # Email is optional
         
-        if '@' not in email or '.' not in email:
-            return False
-        
-        return True
+        return _EMAIL_RE.fullmatch(email) is not None
     
     @staticmethod
     def export_to_json(data, filename):
         """Export data to JSON format"""
         try:
-            with open(filename, 'w') as f:
-                json.dump(data, f, indent=2)
+            if orjson is not None:
+                payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+            else:
+                payload = json.dumps(data, indent=2).encode('utf-8')
+            
+            with open(filename, 'wb') as f:
+                f.write(payload)
             return True, f"Data exported to {filename}"
         except Exception as e:
             return False, f"Export failed: {str(e)}"
@@ -151,43 +233,49 @@ class Utils:
         cutoff_date = datetime.now() - timedelta(days=keep_days)
         removed_count = 0
         
-        for filename in os.listdir(backup_folder):
-            filepath = os.path.join(backup_folder, filename)
-            
-            if os.path.isfile(filepath):
-                file_modified = datetime.fromtimestamp(os.path.getmtime(filepath))
-                
-                if file_modified < cutoff_date:
-                    os.remove(filepath)
+        cutoff_ts = cutoff_date.timestamp()
+        
+        # DirEntry caches the type/stat info, so one stat per file at most
+        with os.scandir(backup_folder) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < cutoff_ts:
+                    os.remove(entry.path)
                     removed_count += 1
         
         return removed_count
     
+    _system_info = None
+    
     @staticmethod
     def get_system_info():
-        """Get system information"""
-        import platform
-        import cv2
-        
-        return {
-            'python_version': platform.python_version(),
-            'opencv_version': cv2.__version__,
-            'platform': platform.system(),
-            'architecture': platform.machine()
-        }
+        """Get system information (collected once per process)"""
+        if Utils._system_info is None:
+            import platform
+            import cv2
+            
+            uname = platform.uname()
+            Utils._system_info = {
+                'python_version': platform.python_version(),
+                'opencv_version': cv2.__version__,
+                'platform': uname.system,
+                'architecture': uname.machine
+            }
+        return dict(Utils._system_info)
     
     @staticmethod
     def log_event(message, log_file='logs/system.log'):
         """Log an event to file"""
-        if not os.path.exists('logs'):
-            os.makedirs('logs')
-        
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        log_message = f"[{timestamp}] {message}\n"
+        log_message = f"[{_log_timestamp()}] {message}\n"
         
         try:
-            with open(log_file, 'a') as f:
-                f.write(log_message)
+            with _log_lock:
+                handle = _log_files.get(log_file)
+                if handle is None:
+                    # Opened once, line-buffered so each event still hits the file
+                    os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+                    handle = open(log_file, 'a', buffering=1)
+                    _log_files[log_file] = handle
+                handle.write(log_message)
             return True
         except:
             return False
@@ -195,21 +283,26 @@ class Utils:
     @staticmethod
     def calculate_attendance_percentage(db_manager, person_id, days=30):
         """Calculate attendance percentage for a person"""
+        return Utils.calculate_attendance_percentages(db_manager, [person_id], days)[person_id]
+    
+    @staticmethod
+    def calculate_attendance_percentages(db_manager, person_ids, days=30):
+        """Attendance percentage for many people with a single grouped query"""
         end_date = date.today().isoformat()
         start_date = (date.today() - timedelta(days=days)).isoformat()
         
-        records = db_manager.get_person_attendance(person_id, start_date, end_date)
-        
-        total_days = days
-        present_days = len(records)
-        percentage = (present_days / total_days) * 100
+        counts = dict(db_manager.get_attendance_counts(person_ids, start_date, end_date))
         
-        return {
-            'total_days': total_days,
-            'present_days': present_days,
-            'absent_days': total_days - present_days,
-            'percentage': round(percentage, 2)
-        }
+        results = {}
+        for person_id in person_ids:
+            present_days = counts.get(person_id, 0)
+            results[person_id] = {
+                'total_days': days,
+                'present_days': present_days,
+                'absent_days': days - present_days,
+                'percentage': round((present_days / days) * 100, 2)
+            }
+        return results
     
     @staticmethod
     def generate_attendance_summary(db_manager, start_date, end_date):
@@ -224,17 +317,19 @@ class Utils:
                 person_attendance[person_id] = {
                     'name': record[1],
                     'days_present': 0,
-                    'total_hours': 0
+                    'total_seconds': 0
                 }
             
             person_attendance[person_id]['days_present'] += 1
             
-            # Calculate hours if both times available
-            if record[3] and record[4]:
-                duration = Utils.calculate_duration(record[3], record[4])
-                if 'h' in duration:
-                    hours = int(duration.split('h')[0])
-                    person_attendance[person_id]['total_hours'] += hours
+            # Accumulate seconds if both times available (minutes are kept)
+            seconds = _duration_seconds(record[3], record[4])
+            if seconds:
+                person_attendance[person_id]['total_seconds'] += seconds
+        
+        # Convert to hours once, at the end
+        for summary in person_attendance.values():
+            summary['total_hours'] = round(summary.pop('total_seconds') / 3600, 2)
         
         return person_attendance
     
@@ -243,22 +338,18 @@ class Utils:
         """Export detailed attendance report with duration calculations"""
         records = db_manager.get_all_attendance(start_date, end_date)
         
-        with open(output_file, 'w', newline='') as csvfile:
+        # 1 MiB buffer: the whole report goes out in a few large writes
+        with open(output_file, 'w', newline='', buffering=1 << 20) as csvfile:
             writer = csv.writer(csvfile)
             writer.writerow([
                 'Person ID', 'Name', 'Date', 'Arrival Time', 
                 'Leaving Time', 'Duration', 'Status'
             ])
             
-            for record in records:
-                duration = Utils.calculate_duration(record[3], record[4])
-                writer.writerow([
-                    record[0], record[1], record[2], 
-                    record[3] or 'N/A', 
-                    record[4] or 'N/A', 
-                    duration, 
-                    record[5]
-                ])
+            writer.writerows(
+                (r[0], r[1], r[2], r[3] or 'N/A', r[4] or 'N/A', Utils.calculate_duration(r[3], r[4]), r[5])
+                for r in records
+            )
         
         return True, f"Detailed report exported to {output_file}"
 
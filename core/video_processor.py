@@ -2,8 +2,14 @@ import cv2
 import numpy as np
 import supervision as sv
 import os
+import queue
+import threading
 from datetime import datetime
-from config.config import UNKNOWN_FACES_DIR
+from config.config import (UNKNOWN_FACES_DIR, SNAPSHOT_JPEG_QUALITY, PROCESS_EVERY_N_FRAMES,
+                           RESIZE_FACTOR, DETECTION_MAX_SIDE)
+from core.kernels import assign_tracks
+
+SNAPSHOT_JPEG_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, SNAPSHOT_JPEG_QUALITY]
 
 class VideoProcessor:
     def __init__(self, face_handler):
@@ -31,9 +37,44 @@ class VideoProcessor:
         # Track logged unknown faces to prevent duplicate logging
         self.logged_unknown_ids = set()
         
+        # Annotation canvas, reused across frames of the same size
+        self._scene_buf = None
+        
+        # Info panel: cached background + static labels, and the output canvas
+        self._panel_cache = None
+        self._panel_out = None
+        
+        # Detection runs on every detect_every-th frame; frames in between
+        # reuse the last tracked boxes
+        self.detect_every = PROCESS_EVERY_N_FRAMES
+        self.frame_count = 0
+        self.last_detections = sv.Detections.empty()
+        self.last_faces = []
+        
         # Ensure unknown faces directory exists
         if not os.path.exists(UNKNOWN_FACES_DIR):
             os.makedirs(UNKNOWN_FACES_DIR)
+        
+        # Unknown-face snapshots (and their DB log) are written by a
+        # background thread so disk/DB latency never stalls the video loop
+        self._disk_queue = queue.Queue(maxsize=64)
+        threading.Thread(target=self._disk_worker, daemon=True).start()
+    
+    def _disk_worker(self):
+        """Save queued unknown-face snapshots, then hand them to their callback"""
+        while True:
+            filepath, face_crop, embedding, callback = self._disk_queue.get()
+            try:
+                # Encode explicitly (fixed quality, no extension-based codec
+                # lookup) and write the bytes ourselves
+                ok, buf = cv2.imencode('.jpg', face_crop, SNAPSHOT_JPEG_PARAMS)
+                if not ok:
+                    raise ValueError(f"could not encode {filepath}")
+                with open(filepath, 'wb') as f:
+                    f.write(buf)
+                callback(filepath, embedding)
+            except Exception as e:
+                print(f"Snapshot Error: {e}")
     
     def clear_cache(self):
         """Forces the processor to forget currently tracked faces"""
@@ -45,38 +86,36 @@ class VideoProcessor:
         Process a single frame for Face Recognition and Tracking.
         Returns: (detections, labels, faces, messages)
         """
-        from config.config import PROCESS_EVERY_N_FRAMES, RESIZE_FACTOR
-        
-        # Initialize frame counter if not exists
-        if not hasattr(self, 'frame_count'):
-            self.frame_count = 0
-            self.last_detections = sv.Detections.empty()
-            self.last_faces = []
-        
         self.frame_count += 1
+        is_detection_frame = self.frame_count % self.detect_every == 0
         
         # --- PROCESS EVERY Nth FRAME ---
-        if self.frame_count % PROCESS_EVERY_N_FRAMES == 0:
+        if is_detection_frame:
             
-            # 1. Resize for faster inference
-            small_frame = cv2.resize(frame, (0, 0), fx=RESIZE_FACTOR, fy=RESIZE_FACTOR)
+            # 1. Resize for faster inference (capped so 1080p+ streams do not
+            # feed the detector more pixels than DETECTION_MAX_SIDE)
+            scale = min(RESIZE_FACTOR, DETECTION_MAX_SIDE / max(frame.shape[:2]))
+            small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
             
             # 2. Detect faces on small frame
             faces = self.face_handler.detect_faces(small_frame)
             
-            # 3. Scale back coordinates to original size
+            # 3. Scale back coordinates to original size (crops and
+            # annotation use the full-resolution frame)
+            inv_scale = 1.0 / scale
             for face in faces:
-                face.bbox = face.bbox / RESIZE_FACTOR
+                face.bbox = face.bbox * inv_scale
                 if hasattr(face, 'kps') and face.kps is not None:
-                    face.kps = face.kps / RESIZE_FACTOR
+                    face.kps = face.kps * inv_scale
             
             self.last_faces = faces
             
             # 4. Format detections for ByteTrack
+            # (float32 like InsightFace's outputs, instead of the float64 default)
             if len(faces) > 0:
-                xyxy = np.array([face.bbox for face in faces])
-                confidence = np.array([face.det_score for face in faces])
-                class_id = np.zeros(len(faces), dtype=int)
+                xyxy = np.stack([face.bbox for face in faces]).astype(np.float32, copy=False)
+                confidence = np.fromiter((face.det_score for face in faces), dtype=np.float32, count=len(faces))
+                class_id = np.zeros(len(faces), dtype=np.int32)
                 
                 detections = sv.Detections(
                     xyxy=xyxy, 
@@ -100,13 +139,14 @@ class VideoProcessor:
         
         labels = []
         messages = []
+        assignments = None  # Best face per track, computed on first new track
+        boxes_int = None    # Track boxes clipped to the frame, computed on first unknown
         
         # Loop through tracked detections
         for i in range(len(tracked_detections)):
             if tracked_detections.tracker_id is None: continue
             
             tracker_id = tracked_detections.tracker_id[i]
-            current_bbox = tracked_detections.xyxy[i]
             
             # --- CASE 1: EXISTING TRACK (We already know who this is) ---
             if tracker_id in self.tracker_id_to_person:
@@ -114,7 +154,7 @@ class VideoProcessor:
                 label = f"{person_name} ({person_id})"
                 
                 # Update attendance (Only on processed frames to save DB calls)
-                if self.frame_count % PROCESS_EVERY_N_FRAMES == 0 and mark_attendance_callback:
+                if is_detection_frame and mark_attendance_callback:
                     success, message = mark_attendance_callback(person_id, person_name)
                     if success and message and "Tracking" not in message:
                         messages.append(message)
@@ -122,18 +162,19 @@ class VideoProcessor:
             # --- CASE 2: NEW TRACK (We need to recognize the face) ---
             else:
                 # Only run recognition on the processed frame to save resources
-                if self.frame_count % PROCESS_EVERY_N_FRAMES != 0:
+                if not is_detection_frame:
                      label = f"Tracking #{tracker_id}"
                 else:
                     best_face = None
-                    max_iou = 0.0
                     
-                    # Find matching face detection
-                    for face in faces:
-                        iou = self.calculate_iou(current_bbox, face.bbox)
-                        if iou > 0.5 and iou > max_iou:
-                            max_iou = iou
-                            best_face = face
+                    # Find matching face detection (one IoU matrix per frame)
+                    if len(faces) > 0:
+                        if assignments is None:
+                            assignments = assign_tracks(self.calculate_iou_matrix(
+                                tracked_detections.xyxy, xyxy
+                            ), 0.5)
+                        if assignments[i] >= 0:
+                            best_face = faces[assignments[i]]
 
                     if best_face:
                         # Check against the pickle file
@@ -157,21 +198,25 @@ class VideoProcessor:
                                 filename = f"unknown_{timestamp}.jpg"
                                 filepath = os.path.join(UNKNOWN_FACES_DIR, filename)
                                 
-                                # Save the face crop
-                                x1, y1, x2, y2 = map(int, current_bbox)
-                                h, w, _ = frame.shape
-                                x1, y1 = max(0, x1), max(0, y1)
-                                x2, y2 = min(w, x2), min(h, y2)
+                                # Save the face crop (all track boxes clipped in one call)
+                                if boxes_int is None:
+                                    h, w = frame.shape[:2]
+                                    boxes_int = np.clip(tracked_detections.xyxy.astype(np.int32), 0, [w, h, w, h])
+                                x1, y1, x2, y2 = boxes_int[i]
                                 
                                 face_crop = frame[y1:y2, x1:x2]
                                 
                                 if face_crop.size > 0:
-                                    cv2.imwrite(filepath, face_crop)
-                                    
-                                    # 2. Log to DB
-                                    unknown_person_callback(filepath, best_face.embedding)
-                                    self.logged_unknown_ids.add(tracker_id)
-                                    messages.append(f"Logged Unknown Person #{tracker_id}")
+                                    # 2. Write + log to DB in the background (the crop
+                                    # is copied: callers may draw on the frame next)
+                                    try:
+                                        self._disk_queue.put_nowait(
+                                            (filepath, face_crop.copy(), best_face.embedding, unknown_person_callback)
+                                        )
+                                        self.logged_unknown_ids.add(tracker_id)
+                                        messages.append(f"Logged Unknown Person #{tracker_id}")
+                                    except queue.Full:
+                                        pass  # Writer is behind; retried on the next processed frame
                     else:
                         label = f"Tracking #{tracker_id}"
             
@@ -183,10 +228,16 @@ class VideoProcessor:
         """
         Draw bounding boxes, labels, and landmarks on the frame.
         This allows the UI to draw on the *latest* frame using the *latest known* data.
+        The returned image is overwritten by the next call; copy it to keep it.
         """
+        # Draw on a persistent copy of the frame instead of allocating one per call
+        if self._scene_buf is None or self._scene_buf.shape != frame.shape:
+            self._scene_buf = np.empty_like(frame)
+        np.copyto(self._scene_buf, frame)
+        
         # Annotate boxes and labels
         annotated_frame = self.box_annotator.annotate(
-            scene=frame.copy(),
+            scene=self._scene_buf,
             detections=detections,
             labels=labels
         )
@@ -207,24 +258,64 @@ class VideoProcessor:
         iou = interArea / float(boxAArea + boxBArea - interArea + 1e-6)
         return iou
 
+    def calculate_iou_matrix(self, boxes_a, boxes_b):
+        """IoU of every box in boxes_a (N, 4) against every box in boxes_b (M, 4) -> (N, M)"""
+        a = boxes_a[:, None, :]
+        b = boxes_b[None, :, :]
+        inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+        inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+        inter = inter_w * inter_h
+        area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+        area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+        return inter / (area_a + area_b - inter + 1e-6)
+
     def draw_landmarks(self, frame, faces):
-        for face in faces:
-            if hasattr(face, 'kps') and face.kps is not None:
-                for point in face.kps:
-                    cv2.circle(frame, (int(point[0]), int(point[1])), 2, (0, 255, 0), -1)
+        kps = [face.kps for face in faces if getattr(face, 'kps', None) is not None]
+        if kps:
+            # One call for every point: a zero-length segment with round caps
+            # rasterizes exactly like a filled radius-2 cv2.circle
+            pts = np.concatenate(kps).astype(np.int32)
+            cv2.polylines(frame, np.repeat(pts[:, None, :], 2, axis=1), False, (0, 255, 0), 4)
         return frame
     
+    def _info_panel_base(self, width, keys):
+        """Panel background with the static "key: " labels, cached per (width, keys)"""
+        if self._panel_cache is None or self._panel_cache[0] != (width, keys):
+            panel_height = 80
+            panel = np.empty((panel_height, width, 3), dtype=np.uint8)
+            panel[:] = (40, 40, 40)
+            y_offset = 25
+            x_offset = 20
+            value_origins = []
+            for key in keys:
+                label = f"{key}: "
+                cv2.putText(panel, label, (x_offset, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+                # Advance of the label inside a longer string (what "key: value" used)
+                label_width = (cv2.getTextSize(label + "0", cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0][0]
+                               - cv2.getTextSize("0", cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0][0])
+                value_origins.append((x_offset + label_width, y_offset))
+                y_offset += 25
+            self._panel_cache = ((width, keys), panel, value_origins)
+        return self._panel_cache[1], self._panel_cache[2]
+    
     def draw_info_panel(self, frame, info_dict):
-        panel_height = 80
-        panel = np.zeros((panel_height, frame.shape[1], 3), dtype=np.uint8)
-        panel[:] = (40, 40, 40)
-        y_offset = 25
-        x_offset = 20
-        for key, value in info_dict.items():
-            text = f"{key}: {value}"
-            cv2.putText(panel, text, (x_offset, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            y_offset += 25
-        return np.vstack([panel, frame])
+        """Stack the info panel above the frame; only the values are drawn per call.
+        The returned image is overwritten by the next call"""
+        panel, value_origins = self._info_panel_base(frame.shape[1], tuple(info_dict))
+        panel_height = panel.shape[0]
+        
+        out_shape = (panel_height + frame.shape[0], frame.shape[1], 3)
+        if self._panel_out is None or self._panel_out.shape != out_shape:
+            self._panel_out = np.empty(out_shape, dtype=np.uint8)
+        out = self._panel_out
+        out[:panel_height] = panel
+        out[panel_height:] = frame
+        
+        # Draw into the panel rows only (text below the panel is clipped, as before)
+        panel_view = out[:panel_height]
+        for value, origin in zip(info_dict.values(), value_origins):
+            cv2.putText(panel_view, str(value), origin, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        return out
     
     def add_fps_counter(self, frame, fps):
         text = f"FPS: {fps:.1f}"
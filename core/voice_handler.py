@@ -1,24 +1,43 @@
-import pyttsx3
+import queue
 import threading
 
 class VoiceSystem:
     def __init__(self):
-        # We don't initialize the engine here to avoid threading conflicts.
-        # We initialize it inside the thread every time we speak.
-        pass
+        # One worker thread owns the engine for its whole life (pyttsx3
+        # engines must be used from the thread that created them)
+        self._queue = queue.Queue(maxsize=4)
+        self._worker = None
+        self._lock = threading.Lock()
 
     def speak(self, text):
         """Public method to trigger speech without freezing the app"""
-        threading.Thread(target=self._speak_thread, args=(text,), daemon=True).start()
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._speak_worker, daemon=True)
+                    self._worker.start()
 
-    def _speak_thread(self, text):
-        """Internal thread logic"""
         try:
-            engine = pyttsx3.init()
-            engine.setProperty('rate', 230)  # Speed (Default is usually 200)
-            engine.setProperty('volume', 1.0) # Volume (0.0 to 1.0)
-            
-            engine.say(text)
-            engine.runAndWait()
-        except Exception as e:
-            print(f"Voice Error: {e}")
\ No newline at end of file
+            self._queue.put_nowait(text)
+        except queue.Full:
+            # Already far behind; drop rather than announce stale events
+            print(f"Voice queue full, dropped: {text}")
+
+    def _speak_worker(self):
+        """Internal thread logic: speak queued messages one at a time"""
+        engine = None
+        while True:
+            text = self._queue.get()
+            try:
+                if engine is None:
+                    import pyttsx3  # Deferred: loads the platform TTS driver
+
+                    engine = pyttsx3.init()
+                    engine.setProperty('rate', 230)  # Speed (Default is usually 200)
+                    engine.setProperty('volume', 1.0) # Volume (0.0 to 1.0)
+
+                engine.say(text)
+                engine.runAndWait()
+            except Exception as e:
+                print(f"Voice Error: {e}")
+                engine = None  # Re-create the engine on the next message
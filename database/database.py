@@ -1,18 +1,108 @@
 import mysql.connector
-from mysql.connector import errorcode
+from mysql.connector import errorcode, pooling
+from mysql.connector.constants import ClientFlag
 import pickle
 import base64
+import threading
+import itertools
+import time
+import atexit
+import numpy as np
 from datetime import datetime, date
-from config.config import MYSQL_CONFIG
+from config.config import MYSQL_CONFIG, MYSQL_POOL_NAME, MYSQL_POOL_SIZE, LOG_FLUSH_INTERVAL, LOG_BUFFER_MAX
+
+def _encode_embedding(encoding):
+    """Serialize an embedding as raw little-endian float32 bytes (LONGBLOB)"""
+    return np.asarray(encoding, dtype='<f4').ravel().tobytes()
+
+def _decode_embedding(data):
+    """Inverse of _encode_embedding; also reads legacy base64(pickle) values"""
+    if isinstance(data, str):
+        data = data.encode('ascii')
+    data = bytes(data)
+    
+    # Rows written before the BLOB migration are base64 text ('gA' = pickle header)
+    if data[:2] == b'gA':
+        try:
+            return np.asarray(pickle.loads(base64.b64decode(data, validate=True)), dtype=np.float32).ravel()
+        except Exception:
+            pass
+    return np.frombuffer(data, dtype='<f4').copy()
+
+# Shared by get_today_attendance and export_to_csv
+TODAY_ATTENDANCE_QUERY = '''
+    SELECT a.person_id, p.name, CAST(a.arrival_time AS CHAR), CAST(a.leaving_time AS CHAR), a.status
+    FROM attendance a JOIN persons p ON a.person_id = p.person_id
+    WHERE a.date = %s ORDER BY a.arrival_time DESC
+'''
+
+RAW_LOG_INSERT = '''
+    INSERT INTO face_logs (person_id, name, date, time, timestamp) 
+    VALUES (%s, %s, DATE(%s), TIME(%s), %s)
+'''
+
+_pdf_styles = None
+
+def _get_pdf_styles():
+    """Build the PDF report styles once (reportlab is imported on first export)"""
+    global _pdf_styles
+    if _pdf_styles is None:
+        from reportlab.lib import colors
+        from reportlab.platypus import TableStyle
+        from reportlab.lib.styles import getSampleStyleSheet
+        
+        # (title, first table with header row, continuation tables without)
+        _pdf_styles = (getSampleStyleSheet()['Title'], TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ]), TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('BACKGROUND', (0, 0), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ]))
+    return _pdf_styles
 
 class DatabaseManager:
     def __init__(self):
-        self.config = MYSQL_CONFIG
+        # FOUND_ROWS off: sync_daily_attendance relies on an unchanged
+        # ON DUPLICATE KEY UPDATE reporting rowcount 0, not 1 (same as an insert)
+        self.config = dict(MYSQL_CONFIG, client_flags=[-ClientFlag.FOUND_ROWS])
+        self.pool = None
+        self._pool_lock = threading.Lock()
+        
+        # Raw detection logs are buffered and written in batches
+        self._log_buffer = []
+        self._log_lock = threading.Lock()
+        self._log_thread = None
+        atexit.register(self.flush_raw_logs)
+        
+        # person_id -> (day, shift_end_str, shift_end_hour); re-read once a day
+        # (or on update) so other processes' shift edits are picked up
+        self._shift_cache = {}
+        
         self.init_database()
     
     def get_connection(self):
-        """Helper to get a fresh connection"""
-        return mysql.connector.connect(**self.config)
+        """Borrow a pooled connection (conn.close() returns it to the pool)"""
+        # Created lazily so init_database can create the schema first
+        if self.pool is None:
+            with self._pool_lock:
+                if self.pool is None:
+                    self.pool = pooling.MySQLConnectionPool(
+                        pool_name=MYSQL_POOL_NAME,
+                        pool_size=MYSQL_POOL_SIZE,
+                        **self.config
+                    )
+        try:
+            return self.pool.get_connection()
+        except mysql.connector.errors.PoolError:
+            # Every pooled connection is checked out; use a one-off connection
+            return mysql.connector.connect(**self.config)
 
     def init_database(self):
         """Initialize MySQL tables"""
@@ -34,7 +124,7 @@ class DatabaseManager:
                         shift_start VARCHAR(10) DEFAULT '09:00',
                         shift_end VARCHAR(10) DEFAULT '18:00',
                         registered_date VARCHAR(30) NOT NULL,
-                        face_encoding LONGTEXT
+                        face_encoding LONGBLOB
                     )
                 ''')
                 print("Table 'persons' checked/created.")
@@ -47,9 +137,9 @@ class DatabaseManager:
                     CREATE TABLE IF NOT EXISTS attendance (
                         id INT AUTO_INCREMENT PRIMARY KEY,
                         person_id VARCHAR(50) NOT NULL,
-                        date VARCHAR(20) NOT NULL,
-                        arrival_time VARCHAR(20),
-                        leaving_time VARCHAR(20),
+                        date DATE NOT NULL,
+                        arrival_time TIME,
+                        leaving_time TIME,
                         status VARCHAR(20) DEFAULT 'Present',
                         FOREIGN KEY (person_id) REFERENCES persons (person_id) ON DELETE CASCADE,
                         UNIQUE KEY unique_attendance (person_id, date)
@@ -83,13 +173,69 @@ class DatabaseManager:
                         id INT AUTO_INCREMENT PRIMARY KEY,
                         timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
                         snapshot_path VARCHAR(255),
-                        face_encoding LONGTEXT
+                        face_encoding LONGBLOB
                     )
                 ''')
                 print("Table 'unknown_faces' checked/created.")
             except mysql.connector.Error as err:
                 print(f"Error creating 'unknown_faces' table: {err}")
             
+            # 5. Encodings moved from base64(pickle) LONGTEXT to raw float32 LONGBLOB
+            for table in ('persons', 'unknown_faces'):
+                try:
+                    cursor.execute('''
+                        SELECT DATA_TYPE FROM information_schema.COLUMNS
+                        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'face_encoding'
+                    ''', (table,))
+                    rows = cursor.fetchall()
+                    data_type = rows[0][0] if rows else None
+                    if isinstance(data_type, (bytes, bytearray)):
+                        data_type = data_type.decode()
+                    if data_type and data_type.lower() != 'longblob':
+                        # Existing text rows keep their bytes; _decode_embedding reads both
+                        cursor.execute(f'ALTER TABLE {table} MODIFY face_encoding LONGBLOB')
+                        print(f"Column '{table}.face_encoding' migrated to LONGBLOB.")
+                except mysql.connector.Error as err:
+                    print(f"Error migrating '{table}.face_encoding': {err}")
+            
+            # 6. Attendance date/times moved from VARCHAR to native DATE/TIME
+            # (readers CAST them back, so callers still get 'YYYY-MM-DD' / 'HH:MM:SS')
+            try:
+                cursor.execute('''
+                    SELECT DATA_TYPE FROM information_schema.COLUMNS
+                    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'attendance' AND COLUMN_NAME = 'date'
+                ''')
+                rows = cursor.fetchall()
+                data_type = rows[0][0] if rows else None
+                if isinstance(data_type, (bytes, bytearray)):
+                    data_type = data_type.decode()
+                if data_type and data_type.lower() != 'date':
+                    cursor.execute("UPDATE attendance SET arrival_time = NULL WHERE arrival_time = ''")
+                    cursor.execute("UPDATE attendance SET leaving_time = NULL WHERE leaving_time = ''")
+                    cursor.execute('''
+                        ALTER TABLE attendance
+                            MODIFY date DATE NOT NULL,
+                            MODIFY arrival_time TIME,
+                            MODIFY leaving_time TIME
+                    ''')
+                    print("Table 'attendance' migrated to DATE/TIME columns.")
+            except mysql.connector.Error as err:
+                print(f"Error migrating 'attendance' columns: {err}")
+            
+            # 7. Secondary indexes (MySQL has no CREATE INDEX IF NOT EXISTS;
+            # an existing index raises ER_DUP_KEYNAME). (person_id, date) is
+            # already covered by the unique_attendance key.
+            for name, ddl in (
+                ('idx_att_date', 'CREATE INDEX idx_att_date ON attendance (date)'),
+                ('idx_logs_pid_ts', 'CREATE INDEX idx_logs_pid_ts ON face_logs (person_id, timestamp)'),
+            ):
+                try:
+                    cursor.execute(ddl)
+                    print(f"Index '{name}' created.")
+                except mysql.connector.Error as err:
+                    if err.errno != errorcode.ER_DUP_KEYNAME:
+                        print(f"Error creating index '{name}': {err}")
+            
             conn.commit()
             cursor.close()
             conn.close()
@@ -120,37 +266,76 @@ class DatabaseManager:
     # --- CORE LOGGING & ATTENDANCE ---
 
     def log_raw_detection(self, person_id, person_name):
-        """Logs detection with Name, Date and Time"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        """Logs detection with Name, Date and Time (buffered, see flush_raw_logs)"""
+        now = datetime.now().replace(microsecond=0)  # TIME() would keep the fraction
+        with self._log_lock:
+            # date/time are derived from the timestamp by MySQL at flush time
+            self._log_buffer.append((person_id, person_name, now, now, now))
+            if self._log_thread is None:
+                self._log_thread = threading.Thread(target=self._log_flush_worker, daemon=True)
+                self._log_thread.start()
+
+    def _log_flush_worker(self):
+        """Flush the raw log buffer every LOG_FLUSH_INTERVAL seconds"""
+        while True:
+            time.sleep(LOG_FLUSH_INTERVAL)
+            self.flush_raw_logs()
+
+    def flush_raw_logs(self):
+        """Write every buffered detection log with one executemany + commit"""
+        with self._log_lock:
+            rows, self._log_buffer = self._log_buffer, []
+        if not rows:
+            return
+        
         try:
-            now = datetime.now()
-            current_date = now.strftime('%Y-%m-%d')
-            current_time = now.strftime('%H:%M:%S')
-            
-            cursor.execute('''
-                INSERT INTO face_logs (person_id, name, date, time, timestamp) 
-                VALUES (%s, %s, %s, %s, NOW())
-            ''', (person_id, person_name, current_date, current_time))
-            
-            conn.commit()
+            conn = self.get_connection()
+        except mysql.connector.Error as err:
+            print(f"Log Error: {err}")
+            self._requeue_raw_logs(rows)
+            return
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(RAW_LOG_INSERT, rows)
+                conn.commit()
+            except (mysql.connector.IntegrityError, mysql.connector.DataError) as e:
+                # One bad row (e.g. a person deleted since detection) fails the
+                # whole batch; retry row by row so only the bad rows are dropped
+                conn.rollback()
+                dropped = 0
+                for row in rows:
+                    try:
+                        cursor.execute(RAW_LOG_INSERT, row)
+                    except (mysql.connector.IntegrityError, mysql.connector.DataError):
+                        dropped += 1
+                conn.commit()
+                print(f"Log Error: dropped {dropped} of {len(rows)} rows ({e})")
         except Exception as e:
+            # Connection-level failure: nothing was committed, keep the batch
             print(f"Log Error: {e}")
+            self._requeue_raw_logs(rows)
         finally:
             conn.close()
 
+    def _requeue_raw_logs(self, rows):
+        """Put an unwritten batch back in front of the buffer, keeping at most LOG_BUFFER_MAX rows"""
+        with self._log_lock:
+            self._log_buffer[:0] = rows
+            overflow = len(self._log_buffer) - LOG_BUFFER_MAX
+            if overflow > 0:
+                del self._log_buffer[:overflow]  # Oldest logs go first
+                print(f"Log Error: buffer full, dropped {overflow} oldest rows")
+
     def log_unknown_person(self, snapshot_path, face_encoding):
         """Logs unknown person with snapshot and encoding"""
         conn = self.get_connection()
         cursor = conn.cursor()
         try:
-            pickled_data = pickle.dumps(face_encoding)
-            safe_data_string = base64.b64encode(pickled_data).decode('utf-8')
-            
             cursor.execute('''
                 INSERT INTO unknown_faces (snapshot_path, face_encoding) 
                 VALUES (%s, %s)
-            ''', (snapshot_path, safe_data_string))
+            ''', (snapshot_path, _encode_embedding(face_encoding)))
             
             conn.commit()
             return True
@@ -166,49 +351,46 @@ class DatabaseManager:
         1. Get the person's shift_end from DB.
         2. If current time >= shift_end, update Logout.
         """
-        today = date.today().isoformat()
         now = datetime.now()
+        today = now.date()
         current_time = now.strftime('%H:%M:%S')
         
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
-            # 1. Get Person's Shift Details
-            cursor.execute('SELECT shift_end FROM persons WHERE person_id = %s', (person_id,))
-            person_data = cursor.fetchone()
-            
-            if not person_data:
-                return "Error: Person not found"
+            # 1. Get Person's Shift Details (cached for the day)
+            shift = self._shift_cache.get(person_id)
+            if shift is None or shift[0] != today:
+                cursor.execute('SELECT shift_end FROM persons WHERE person_id = %s', (person_id,))
+                person_data = cursor.fetchone()
                 
-            # Parse user's specific shift end (e.g., "18:00")
-            user_shift_end_str = person_data[0] 
-            try:
-                user_shift_end_hour = int(user_shift_end_str.split(':')[0])
-            except:
-                user_shift_end_hour = 18 # Default fallback
+                if not person_data:
+                    return "Error: Person not found"
+                    
+                # Parse user's specific shift end (e.g., "18:00")
+                try:
+                    shift_end_hour = int(person_data[0].split(':')[0])
+                except:
+                    shift_end_hour = 18 # Default fallback
+                shift = self._shift_cache[person_id] = (today, person_data[0], shift_end_hour)
+            _, user_shift_end_str, user_shift_end_hour = shift
             
-            # 2. Check Attendance Record
-            cursor.execute('SELECT id FROM attendance WHERE person_id = %s AND date = %s', (person_id, today))
-            record = cursor.fetchone()
+            # 2. Login or update leaving time in one statement (unique_attendance
+            # key); rowcount is 1 for a new row, 2 (or 0 if unchanged) for an update.
+            # That only holds without CLIENT_FOUND_ROWS, which __init__ disables
+            cursor.execute('''
+                INSERT INTO attendance (person_id, date, arrival_time, leaving_time, status)
+                VALUES (%s, %s, %s, %s, 'Present')
+                ON DUPLICATE KEY UPDATE leaving_time = VALUES(leaving_time)
+            ''', (person_id, today, current_time, current_time))
+            conn.commit()
             
-            if record is None:
+            if cursor.rowcount == 1:
                 # --- LOGIN ---
-                cursor.execute('''
-                    INSERT INTO attendance (person_id, date, arrival_time, leaving_time, status)
-                    VALUES (%s, %s, %s, %s, 'Present')
-                ''', (person_id, today, current_time, current_time))
-                conn.commit()
                 return f"LOGIN: {current_time}"
             else:
-                # --- UPDATE LEAVING TIME (Always update to latest seen) ---
-                cursor.execute('''
-                    UPDATE attendance 
-                    SET leaving_time = %s 
-                    WHERE person_id = %s AND date = %s
-                ''', (current_time, person_id, today))
-                conn.commit()
-                
+                # --- LEAVING TIME UPDATED (Always the latest seen) ---
                 # Check if shift is over for voice feedback
                 if now.hour >= user_shift_end_hour:
                     return f"LOGOUT UPDATE: {current_time}"
@@ -226,13 +408,10 @@ class DatabaseManager:
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
-            pickled_data = pickle.dumps(face_encoding)
-            safe_data_string = base64.b64encode(pickled_data).decode('utf-8')
-            
             cursor.execute('''
                 INSERT INTO persons (person_id, name, email, department, shift_start, shift_end, registered_date, face_encoding)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (person_id, name, email, department, shift_start, shift_end, datetime.now().isoformat(), safe_data_string))
+            ''', (person_id, name, email, department, shift_start, shift_end, datetime.now().isoformat(), _encode_embedding(face_encoding)))
             
             conn.commit()
             return True, "Person added successfully"
@@ -254,6 +433,7 @@ class DatabaseManager:
                 WHERE person_id=%s
             ''', (name, email, dept, s_start, s_end, person_id))
             conn.commit()
+            self._shift_cache.pop(person_id, None)
             return True, "Update Successful"
         except Exception as e:
             return False, str(e)
@@ -275,11 +455,9 @@ class DatabaseManager:
             for pid, name, encoded_data in rows:
                 if encoded_data:
                     try:
-                        # Decode base64 and unpickle
-                        face_data = pickle.loads(base64.b64decode(encoded_data))
                         encodings[pid] = {
                             'name': name,
-                            'encoding': face_data
+                            'encoding': _decode_embedding(encoded_data)
                         }
                     except Exception as e:
                         print(f"Error decoding face for {name} ({pid}): {e}")
@@ -290,13 +468,38 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    def get_face_encoding_ids(self):
+        """
+        Retrieve (person_id, name, md5 of face_encoding) for every person with a
+        stored face encoding. Cheap check used to validate the local encodings snapshot.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT person_id, name, MD5(face_encoding) FROM persons WHERE face_encoding IS NOT NULL")
+            return cursor.fetchall()
+        except Exception as e:
+            print(f"DB Error fetching encoding ids: {e}")
+            return None
+        finally:
+            conn.close()
+
     def delete_person(self, person_id):
         """Delete a person and their logs"""
+        return self.delete_persons([person_id])
+
+    def delete_persons(self, person_ids):
+        """Delete several persons and their logs in one statement and one commit"""
+        if not person_ids:
+            return True, "Nothing to delete"
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
-            cursor.execute('DELETE FROM persons WHERE person_id=%s', (person_id,))
+            placeholders = ', '.join(['%s'] * len(person_ids))
+            cursor.execute(f'DELETE FROM persons WHERE person_id IN ({placeholders})', tuple(person_ids))
             conn.commit()
+            for person_id in person_ids:
+                self._shift_cache.pop(person_id, None)
             return True, "Deleted Successfully"
         except Exception as e:
             return False, str(e)
@@ -322,61 +525,35 @@ class DatabaseManager:
             
         name, s_start_str, s_end_str = person
         
-        # 2. Get All Attendance Records for this person
-        cursor.execute('SELECT arrival_time, leaving_time FROM attendance WHERE person_id = %s', (person_id,))
-        records = cursor.fetchall()
-        conn.close()
-        
-        # 3. Calculate Stats
-        total_days = len(records)
-        late_count = 0
-        early_out_count = 0
-        total_seconds_worked = 0
-        days_with_full_data = 0
-        
-        def parse_time(t_str, fmt='%H:%M:%S'):
-            try: return datetime.strptime(t_str, fmt)
-            except: return None
-            
         try:
-            shift_start_dt = datetime.strptime(s_start_str, '%H:%M')
-            shift_end_dt = datetime.strptime(s_end_str, '%H:%M')
+            shift_start = datetime.strptime(s_start_str, '%H:%M').strftime('%H:%M:%S')
+            shift_end = datetime.strptime(s_end_str, '%H:%M').strftime('%H:%M:%S')
         except:
+            conn.close()
             return None, "Error parsing shift times in DB"
-
-        for arrival, leaving in records:
-            # Check Late
-            if arrival:
-                arr_dt = parse_time(arrival)
-                if arr_dt and arr_dt.time() > shift_start_dt.time():
-                    late_count += 1
-            
-            # Check Early Out & Avg Hours
-            if leaving:
-                leave_dt = parse_time(leaving)
-                if leave_dt:
-                    if leave_dt.time() < shift_end_dt.time():
-                        early_out_count += 1
-                    
-                    if arrival:
-                        arr_dt = parse_time(arrival)
-                        if arr_dt:
-                            duration = (leave_dt - arr_dt).total_seconds()
-                            if duration > 0:
-                                total_seconds_worked += duration
-                                days_with_full_data += 1
-
-        avg_hours = 0
-        if days_with_full_data > 0:
-            avg_hours = (total_seconds_worked / days_with_full_data) / 3600 
+        
+        # 2. Aggregate in one pass on the server (unparseable times are NULL
+        # and ignored, like the old per-row strptime fallbacks)
+        cursor.execute('''
+            SELECT COUNT(*),
+                   SUM(TIME(arrival_time) > %s),
+                   SUM(TIME(leaving_time) < %s),
+                   AVG(NULLIF(GREATEST(TIME_TO_SEC(TIME(leaving_time)) - TIME_TO_SEC(TIME(arrival_time)), 0), 0))
+            FROM attendance WHERE person_id = %s
+        ''', (shift_start, shift_end, person_id))
+        total_days, late_count, early_out_count, avg_seconds = cursor.fetchone()
+        conn.close()
+        
+        # 3. SUM/AVG come back as Decimal (or NULL when there are no rows)
+        avg_hours = float(avg_seconds or 0) / 3600
 
         return {
             'name': name,
             'id': person_id,
             'shift': f"{s_start_str} - {s_end_str}",
             'total_days': total_days,
-            'late': late_count,
-            'early': early_out_count,
+            'late': int(late_count or 0),
+            'early': int(early_out_count or 0),
             'avg_hours': round(avg_hours, 1)
         }, "Success"
 
@@ -397,11 +574,7 @@ class DatabaseManager:
         today = date.today().isoformat()
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT a.person_id, p.name, a.arrival_time, a.leaving_time, a.status
-            FROM attendance a JOIN persons p ON a.person_id = p.person_id
-            WHERE a.date = %s ORDER BY a.arrival_time DESC
-        ''', (today,))
+        cursor.execute(TODAY_ATTENDANCE_QUERY, (today,))
         records = cursor.fetchall()
         conn.close()
         return records
@@ -431,27 +604,35 @@ class DatabaseManager:
         conn.close()
         return records
 
-    def export_to_csv(self, filename):
+    def export_to_csv(self, filename, batch_size=5000):
         import csv
-        records = self.get_today_attendance()
+        conn = self.get_connection()
+        cursor = None
         try:
-            with open(filename, 'w', newline='') as f:
+            # Stream rows in batches (unbuffered cursor) into a 1 MiB file buffer
+            cursor = conn.cursor()
+            cursor.execute(TODAY_ATTENDANCE_QUERY, (date.today().isoformat(),))
+            with open(filename, 'w', newline='', buffering=1 << 20) as f:
                 writer = csv.writer(f)
                 writer.writerow(['ID', 'Name', 'Login Time', 'Last Seen (Logout)', 'Status'])
-                writer.writerows(records)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    writer.writerows(rows)
             return True, f"Exported to {filename}"
         except Exception as e:
             return False, str(e)
+        finally:
+            conn.consume_results()  # Drop unread rows if the file write failed mid-stream
+            if cursor is not None:
+                cursor.close()
+            conn.close()
 
-    def get_attendance_report(self, start_date, end_date, person_id=None):
-        """
-        Fetch attendance records for a specific date range.
-        """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
+    def _attendance_report_query(self, start_date, end_date, person_id=None):
+        """Build the (query, params) behind the attendance reports"""
         query = '''
-            SELECT a.date, p.name, a.person_id, a.arrival_time, a.leaving_time, a.status
+            SELECT CAST(a.date AS CHAR), p.name, a.person_id, CAST(a.arrival_time AS CHAR), CAST(a.leaving_time AS CHAR), a.status
             FROM attendance a 
             JOIN persons p ON a.person_id = p.person_id
             WHERE a.date BETWEEN %s AND %s
@@ -463,50 +644,129 @@ class DatabaseManager:
             params.append(person_id)
             
         query += ' ORDER BY a.date DESC, a.arrival_time DESC'
+        return query, tuple(params)
+
+    def get_attendance_report(self, start_date, end_date, person_id=None):
+        """
+        Fetch attendance records for a specific date range.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
-        cursor.execute(query, tuple(params))
+        cursor.execute(*self._attendance_report_query(start_date, end_date, person_id))
         records = cursor.fetchall()
         conn.close()
         return records
 
-    def export_to_pdf(self, data, filename, title="Attendance Report"):
+    def iter_attendance_report(self, start_date, end_date, person_id=None, batch_size=1000):
         """
-        Generate a PDF report using ReportLab.
+        Yield the same records as get_attendance_report in batches of up to
+        batch_size rows, so large reports are never held in memory at once.
+        """
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(*self._attendance_report_query(start_date, end_date, person_id))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            conn.consume_results()  # Drop unread rows if the caller stopped early
+            conn.close()
+
+    def get_all_attendance(self, start_date=None, end_date=None):
+        """
+        Fetch (person_id, name, date, arrival_time, leaving_time, status) rows,
+        optionally limited to a date range, in one query.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        query = '''
+            SELECT a.person_id, p.name, CAST(a.date AS CHAR), CAST(a.arrival_time AS CHAR), CAST(a.leaving_time AS CHAR), a.status
+            FROM attendance a
+            JOIN persons p ON a.person_id = p.person_id
+        '''
+        conditions, params = [], []
+        if start_date:
+            conditions.append('a.date >= %s')
+            params.append(start_date)
+        if end_date:
+            conditions.append('a.date <= %s')
+            params.append(end_date)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY a.date, a.person_id'
+
+        try:
+            cursor.execute(query, tuple(params))
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def get_attendance_counts(self, person_ids, start_date, end_date):
+        """Days present per person in a date range: [(person_id, count)]"""
+        if not person_ids:
+            return []
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        placeholders = ', '.join(['%s'] * len(person_ids))
+        try:
+            cursor.execute(f'''
+                SELECT person_id, COUNT(*) FROM attendance
+                WHERE person_id IN ({placeholders}) AND date BETWEEN %s AND %s
+                GROUP BY person_id
+            ''', (*person_ids, start_date, end_date))
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def export_to_pdf(self, data, filename, title="Attendance Report", rows_per_table=50):
+        """
+        Generate a PDF report using ReportLab. data can be any iterable of
+        rows (e.g. the batches of iter_attendance_report, chained).
+        doc.build() needs every flowable up front, so all rows are still held
+        in memory; splitting them into small tables only avoids the re-split cost.
         """
         try:
-            from reportlab.lib import colors
             from reportlab.lib.pagesizes import letter
-            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-            from reportlab.lib.styles import getSampleStyleSheet
+            from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer
+            
+            title_style, table_style, body_style = _get_pdf_styles()
             
             doc = SimpleDocTemplate(filename, pagesize=letter)
             elements = []
             
-            styles = getSampleStyleSheet()
-            elements.append(Paragraph(title, styles['Title']))
+            elements.append(Paragraph(title, title_style))
             elements.append(Spacer(1, 12))
             
-            # Table Header
-            table_data = [['Date', 'Name', 'ID', 'Arrival', 'Leaving', 'Status']]
+            # Rows are laid out as a run of fixed-width tables that read as one
+            # (header on the first only): ReportLab re-splits a single table
+            # once per page, which grows quadratically with the row count
+            widths = [doc.width * f for f in (0.15, 0.25, 0.15, 0.15, 0.15, 0.15)]
+            rows = iter(data)
             
-            # Table Data
-            for row in data:
-                # Ensure all items are strings
-                table_data.append([str(item) if item is not None else "" for item in row])
-                
-            # Create Table
-            t = Table(table_data)
-            t.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ]))
+            def next_chunk():
+                # Data (all items as strings)
+                return [['' if item is None else str(item) for item in row]
+                        for row in itertools.islice(rows, rows_per_table)]
             
+            # Create Tables: Header + first rows, then the rest
+            chunk = next_chunk()
+            t = Table([['Date', 'Name', 'ID', 'Arrival', 'Leaving', 'Status']] + chunk, colWidths=widths)
+            t.setStyle(table_style)
             elements.append(t)
+            while len(chunk) == rows_per_table:
+                chunk = next_chunk()
+                if not chunk:
+                    break
+                t = Table(chunk, colWidths=widths)
+                t.setStyle(body_style)
+                elements.append(t)
+            
             doc.build(elements)
             return True, f"PDF Exported: {filename}"
         except ImportError:
@@ -11,7 +11,14 @@ try:
     response.raise_for_status()
     
     with open(filename, 'wb') as f:
-        for chunk in response.iter_content(chunk_size=8192):
+        # Reserve the whole file up front when the size is known (less
+        # fragmentation); with a Content-Encoding the length is not the file size
+        size = int(response.headers.get('Content-Length', 0))
+        if size and 'Content-Encoding' not in response.headers and hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(f.fileno(), 0, size)
+        
+        # 1 MiB chunks: ~100 writes for the wheel instead of ~13k
+        for chunk in response.iter_content(chunk_size=1 << 20):
             f.write(chunk)
             
     print(f"Successfully downloaded {filename}")
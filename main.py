@@ -1,13 +1,13 @@
-import cv2
 import time
+import argparse
+import threading
 import warnings
 import traceback
 from datetime import datetime
 from database.database import DatabaseManager
-from core.face_recognition import FaceRecognitionHandler
-from core.attendance_tracker import AttendanceTracker
-from core.video_processor import VideoProcessor
-from config.config import get_config
+from core.camera import get_shared_camera, release_shared_cameras
+from core.registration import CAPTURE_KEY, CANCEL_KEY
+from config.config import get_config, CAMERA_STALL_TIMEOUT
 
 # Filter warnings to keep console clean
 warnings.filterwarnings("ignore")
@@ -16,14 +16,50 @@ class AttendanceSystem:
     def __init__(self):
         print("Initializing Face Attendance System...")
         
-        # Initialize components
+        # Initialize components (the camera/recognition stack is created on
+        # first use, so viewing or exporting records never loads OpenCV,
+        # supervision or the face gallery)
         self.db_manager = DatabaseManager()
-        self.face_handler = FaceRecognitionHandler(self.db_manager)
-        self.attendance_tracker = AttendanceTracker(self.db_manager, self.face_handler)
-        self.video_processor = VideoProcessor(self.face_handler)
+        self._face_handler = None
+        self._attendance_tracker = None
+        self._video_processor = None
+        
+        # Info-panel stats, refreshed at most once per second (or on events)
+        self._stats_cache = None
+        self._stats_ts = 0.0
+        
+        # Newest (detections, labels, faces) from the inference thread
+        self._latest_results = None
+        self._results_lock = threading.Lock()
         
         print("✓ System initialized successfully!")
     
+    @property
+    def face_handler(self):
+        """Face gallery + InsightFace handler, created on first use"""
+        if self._face_handler is None:
+            from core.face_recognition import FaceRecognitionHandler
+            self._face_handler = FaceRecognitionHandler(self.db_manager)
+        return self._face_handler
+    
+    @property
+    def attendance_tracker(self):
+        """Attendance tracker, created on first use"""
+        if self._attendance_tracker is None:
+            from core.attendance_tracker import AttendanceTracker
+            self._attendance_tracker = AttendanceTracker(self.db_manager, self.face_handler)
+        return self._attendance_tracker
+    
+    @property
+    def video_processor(self):
+        """Video processor (tracking + drawing), created on first use"""
+        if self._video_processor is None:
+            from core.video_processor import VideoProcessor
+            from core import kernels
+            self._video_processor = VideoProcessor(self.face_handler)
+            kernels.warm_up()  # JIT compile now, not on the first camera frame
+        return self._video_processor
+    
     def display_menu(self):
         """Display main menu"""
         print("\n" + "="*60)
@@ -38,9 +74,13 @@ class AttendanceSystem:
     
     def start_automatic_attendance(self):
         """Run the main attendance system"""
+        import cv2
+        
         source = get_config()['webcam_index']
         print(f"Connecting to camera: {source}")
-        cap = cv2.VideoCapture(source)
+        # Background reader keeps only the newest frame so the detector
+        # never falls behind the stream (shared, released on exit)
+        cap = get_shared_camera(source)
         
         if not cap.isOpened():
             print(f"Error: Could not open webcam ({source})")
@@ -54,27 +94,48 @@ class AttendanceSystem:
         print("• Raw Logs        = Saved every 90 seconds")
         print("\nPress 'q' to Stop and return to menu.")
         
+        # Capture (ThreadedCamera), inference and display each run on their
+        # own thread, so the window keeps updating while the model runs
+        # Create the lazy components here, before the worker can race to do so
+        _ = self.video_processor, self.attendance_tracker
+        self._latest_results = None
+        stop_event = threading.Event()
+        worker = threading.Thread(target=self._inference_loop, args=(cap, stop_event), daemon=True)
+        worker.start()
+        
         fps_start_time = time.time()
         fps_counter = 0
         fps = 0
+        last_frame = None
+        last_frame_time = time.time()
+        
+        # Info panel values, updated in place (keys fix the panel layout)
+        info = {'System': 'AUTO', 'Registered': 0, 'Present': 0, 'FPS': "0"}
         
         while True:
             ret, frame = cap.read()
-            if not ret:
-                print("Error: Cannot read from webcam")
-                break
-            
-            # Process frame
-            annotated_frame, faces, tracked_detections, messages = \
-                self.video_processor.process_frame(
-                    frame, 
-                    mark_attendance_callback=self.attendance_tracker.process_recognized_face,
-                    unknown_person_callback=self.attendance_tracker.process_unknown_person
-                )
+            if not ret or frame is None or frame is last_frame:
+                # No (new) frame yet: nothing to redraw. Give up if the camera
+                # stalls, and keep the stop key responsive meanwhile.
+                if time.time() - last_frame_time > CAMERA_STALL_TIMEOUT:
+                    print("Error: Cannot read from webcam")
+                    break
+                if cv2.pollKey() & 0xFF == CANCEL_KEY:
+                    print("\nStopping attendance system...")
+                    break
+                time.sleep(0.005)
+                continue
+            last_frame = frame
+            last_frame_time = time.time()
             
-            # Print messages to console (optional)
-            for msg in messages:
-                print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
+            # Draw the latest known results on the newest frame
+            with self._results_lock:
+                results = self._latest_results
+            if results:
+                tracked_detections, labels, faces = results
+                annotated_frame = self.video_processor.annotate_frame(frame, tracked_detections, labels, faces)
+            else:
+                annotated_frame = frame
             
             # Calculate FPS
             fps_counter += 1
@@ -82,28 +143,63 @@ class AttendanceSystem:
                 fps = fps_counter
                 fps_counter = 0
                 fps_start_time = time.time()
+                info['FPS'] = str(fps)
             
-            # Draw Info on Screen
-            stats = self.db_manager.get_statistics()
-            info = {
-                'System': 'AUTO',
-                'Registered': stats['total_persons'],
-                'Present': stats['present_today'],
-                'FPS': f"{fps}"
-            }
+            # Draw Info on Screen (stats only change on attendance events,
+            # so re-query on those or once per second, not every frame)
+            now = time.time()
+            if self._stats_cache is None or now - self._stats_ts >= 1.0:
+                self._stats_cache = self.db_manager.get_statistics()
+                self._stats_ts = now
+                info['Registered'] = self._stats_cache['total_persons']
+                info['Present'] = self._stats_cache['present_today']
             
             annotated_frame = self.video_processor.draw_info_panel(annotated_frame, info)
             
             # Display
             cv2.imshow("Face Attendance System", annotated_frame)
             
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            # pollKey pumps the window without waitKey's 1 ms minimum wait
+            # (the loop is paced by the sleep above while no frame is new)
+            if cv2.pollKey() & 0xFF == CANCEL_KEY:
                 print("\nStopping attendance system...")
                 break
         
-        cap.release()
+        stop_event.set()
+        worker.join()
         cv2.destroyAllWindows()
     
+    def _inference_loop(self, cap, stop_event):
+        """Background thread: run recognition on each new frame until stopped"""
+        last_frame = None
+        while not stop_event.is_set():
+            ret, frame = cap.read()
+            if not ret or frame is None or frame is last_frame:
+                time.sleep(0.005)
+                continue
+            last_frame = frame
+            
+            try:
+                # Process frame (detection only every detect_every-th frame)
+                tracked_detections, labels, faces, messages = \
+                    self.video_processor.process_frame(
+                        frame, 
+                        mark_attendance_callback=self.attendance_tracker.process_recognized_face,
+                        unknown_person_callback=self.attendance_tracker.process_unknown_person
+                    )
+            except Exception as e:
+                print(f"Processing Error: {e}")
+                continue
+            
+            with self._results_lock:
+                self._latest_results = (tracked_detections, labels, faces)
+            
+            # Print messages to console (optional): one timestamp, one write
+            if messages:
+                timestamp = time.strftime('%H:%M:%S')
+                print('\n'.join(f"[{timestamp}] {msg}" for msg in messages))
+                self._stats_ts = 0.0  # Attendance changed: refresh stats on next draw
+    
     def register_person_interactive(self):
         """Interactive person registration with Shift Support"""
         print("\n" + "="*60)
@@ -126,29 +222,42 @@ class AttendanceSystem:
         shift_end = input("Shift End (HH:MM)   [Default 18:00]: ").strip() or "18:00"
         
         # 3. Capture Face
+        import cv2
         print("\nOpening Camera for Face Capture...")
         print("Press 'c' to CAPTURE, 'q' to CANCEL")
         
-        cap = cv2.VideoCapture(0)
+        cap = get_shared_camera(0)
         face_encoding = None
         success_capture = False
+        last_frame = None
+        last_frame_time = time.time()
         
-        while True:
+        while cap.isOpened():
             ret, frame = cap.read()
-            if not ret: break
+            if not ret or frame is None or frame is last_frame:
+                # No (new) frame yet: give up if the camera stalls, and keep
+                # the cancel key responsive meanwhile
+                if time.time() - last_frame_time > CAMERA_STALL_TIMEOUT:
+                    print("Error: Cannot read from webcam")
+                    break
+                if cv2.pollKey() & 0xFF == CANCEL_KEY:
+                    break
+                time.sleep(0.005)
+                continue
+            last_frame = frame
+            last_frame_time = time.time()
             
             # Show preview
             cv2.imshow("Registration - Press 'c' to Capture", frame)
             
             key = cv2.waitKey(1) & 0xFF
-            if key == ord('c'):
+            if key == CAPTURE_KEY:
                 # Analyze frame
                 print("Analyzing face...")
                 face_encoding, msg = self.face_handler.extract_face_encoding(frame)
                 
                 if face_encoding is not None:
-                    # Check for duplicates
-                    self.face_handler.load_face_encodings()
+                    # Check for duplicates (one search over the in-memory gallery)
                     exist_id, exist_name, sim = self.face_handler.recognize_face(face_encoding)
                     
                     if exist_id is not None and sim > 0.5:
@@ -160,10 +269,9 @@ class AttendanceSystem:
                 else:
                     print(f"⚠ Face not detected: {msg}")
             
-            elif key == ord('q'):
+            elif key == CANCEL_KEY:
                 break
                 
-        cap.release()
         cv2.destroyAllWindows()
         
         # 4. Save to DB
@@ -238,14 +346,34 @@ class AttendanceSystem:
                 self.export_attendance()
             elif choice == '5':
                 print("\nGoodbye!")
+                release_shared_cameras()
                 break
             else:
                 print("\nInvalid choice. Please try again.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Face Attendance System (CLI)")
+    parser.add_argument('--auto', action='store_true',
+                        help="start automatic attendance directly, without the menu")
+    args = parser.parse_args()
+    
     try:
-        system = AttendanceSystem()
-        system.run()
+        if args.auto:
+            # Open the camera (RTSP handshake / driver init) while the DB and
+            # face gallery initialize; the attendance loop then reuses it
+            camera_opener = threading.Thread(
+                target=get_shared_camera, args=(get_config()['webcam_index'],), daemon=True
+            )
+            camera_opener.start()
+            system = AttendanceSystem()
+            camera_opener.join()
+            try:
+                system.start_automatic_attendance()
+            finally:
+                release_shared_cameras()
+        else:
+            system = AttendanceSystem()
+            system.run()
     except KeyboardInterrupt:
         print("\n\nSystem interrupted by user. Exiting...")
     except Exception as e:
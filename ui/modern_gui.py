@@ -2,15 +2,17 @@ import tkinter as tk
 from tkinter import ttk, messagebox, Toplevel, filedialog
 import threading
 import queue
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 from PIL import Image, ImageTk
 import time
 import math
 from datetime import datetime, timedelta, date
 import os
-import csv
 import sys
 import re
+import subprocess
+import itertools
 
 # --- IMPORT BACKEND ---
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -21,11 +23,56 @@ from core.attendance_tracker import AttendanceTracker
 from core.video_processor import VideoProcessor
 from core.registration import RegistrationModule
 from core.utils import Utils
-from core.camera import ThreadedCamera
+from core.camera import ThreadedCamera, open_capture
+from core import kernels
 from config.config import get_config
 
 # --- THEME COLORS ---
 # --- MODERN THEME COLORS ---
+LOG_LIST_MAX = 200  # Rows kept in the dashboard log (newest first)
+# One sine cycle of the "online" pulse, one colour per 100 ms tick (~1.3 s period)
+PULSE_COLORS = tuple(
+    f"#{v:02x}ff{v:02x}" for v in (int(100 + 50 * math.sin(2 * math.pi * i / 13)) for i in range(13))
+)
+REPORT_CACHE_SIZE = 4           # Finished report ranges kept for the next CSV/PDF export
+REPORT_CACHE_MAX_ROWS = 50000   # ...unless they are bigger than this
+
+# Camera source choices (RTSP channels of the configured NVR, then local webcams)
+CAMERA_OPTIONS = tuple(f"Channel {i}" for i in range(1, 17)) + tuple(f"Webcam {i}" for i in range(5))
+
+# Columns of each Records view (each view has its own Treeview, built once)
+RECORD_COLUMNS = {
+    "summary": ("ID", "Name", "Login", "Logout", "Status"),
+    "logs": ("ID", "Name", "Date", "Time"),
+    "edit": ("ID", "Name", "Email", "Dept", "Shift Start", "Shift End"),
+}
+
+def _open_folder(path):
+    """Open path in the platform file manager without blocking the Tk loop"""
+    def run():
+        try:
+            if sys.platform == 'win32': os.startfile(os.path.normpath(path))
+            elif sys.platform == 'darwin': subprocess.Popen(['open', path])
+            else: subprocess.Popen(['xdg-open', path])
+        except Exception: pass
+    threading.Thread(target=run, daemon=True).start()
+
+def _csv_field(value):
+    """Format one free-text CSV field the way csv.writer does (quote only when needed)"""
+    if value is None: return ''
+    value = str(value)
+    if ',' in value or '"' in value or '\n' in value or '\r' in value:
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+def _report_csv_lines(rows):
+    """(Date, Name, ID, Arrival, Leaving, Status) rows as one CSV text block.
+    Only Name and ID can need quoting; dates, times and status never do."""
+    return ''.join(
+        f"{day},{_csv_field(name)},{_csv_field(pid)},{arrival or ''},{leaving or ''},{status}\r\n"
+        for day, name, pid, arrival, leaving, status in rows
+    )
+
 COLORS = {
     'bg': '#0f172a',        # Deep Slate (Background)
     'sidebar': '#1e293b',   # Slate (Sidebar)
@@ -78,12 +125,16 @@ class FaceAttendancePro:
         self.tracker = AttendanceTracker(self.db, self.face_handler)
         self.processor = VideoProcessor(self.face_handler)
         self.processor2 = VideoProcessor(self.face_handler)
+        kernels.warm_up()  # JIT compile now, not on the first camera frame
+        # Load the InsightFace models off the Tk thread; the first registration
+        # or camera start would otherwise freeze the window for seconds
+        threading.Thread(target=self.face_handler.warm_up, daemon=True).start()
         self.registrar = RegistrationModule(self.db, self.face_handler)
         
         self.caps = []
-        self.is_running = False
+        self.is_running = threading.Event()  # Cameras on; read lock-free by the worker threads
         self.is_paused = False
-        self.current_view = "dashboard"
+        self.current_view = None  # Set by switch_frame ("dashboard" once setup_ui has run)
         self.record_view_mode = "summary"
         
         self.camera_source_1 = tk.StringVar(value="Camera 0")
@@ -97,9 +148,18 @@ class FaceAttendancePro:
         self.log_queue = queue.Queue()
         self.threads_running = False
         self.processing_threads = []
-
-        self.setup_ui()
-        self.animate_pulse()
+        self.camera_session = 0  # Bumped on every start; workers of an older session exit
+        self.video_photos = [None, None]  # One reused tk.PhotoImage per camera label
+        self.reg_photo = None             # ...and one for the registration preview
+        self.last_shown = [(None, None), (None, None)]  # (frame, results) last drawn per camera
+        self.last_stats_ts = 0.0  # Dashboard cards are refreshed from the DB every 2 s
+        self.report_cache = {}    # (start, end, pid) -> rows, for ranges that ended before today
+        self.report_dirs_made = set()  # data/reports/<day> folders already created this session
+        self.pulse_after = None   # Pending animate_pulse callback (only armed on the dashboard)
+        self.pulse_idx = 0        # Position in PULSE_COLORS
+        self.pulse_fill = None    # Fill last sent to Tk
+
+        self.setup_ui()  # Shows the dashboard, which starts the pulse
 
     def setup_ui(self):
         self.sidebar = tk.Frame(self.root, bg=COLORS['sidebar'], width=220)
@@ -126,8 +186,11 @@ class FaceAttendancePro:
         self.frame_dashboard = tk.Frame(self.main_area, bg=COLORS['bg'])
         self.frame_register = tk.Frame(self.main_area, bg=COLORS['bg'])
         self.frame_records = tk.Frame(self.main_area, bg=COLORS['bg'])
+        self.view_frames = {"dashboard": self.frame_dashboard, "register": self.frame_register, "records": self.frame_records}
         
-        self.setup_dashboard(); self.setup_registration(); self.setup_records()
+        # Only the dashboard is built now; the other panes on first visit
+        self.setup_dashboard()
+        self.built_views = {"dashboard"}
         self.show_dashboard()
 
     def create_nav_btn(self, text, command, color=COLORS['card']):
@@ -149,9 +212,6 @@ class FaceAttendancePro:
         c = tk.Frame(self.frame_dashboard, bg=COLORS['card'], padx=15, pady=15)
         c.pack(fill="x", pady=(0, 15))
         
-        # Camera Options (Styled)
-        cam_options = [f"Channel {i}" for i in range(1, 17)] + [f"Webcam {i}" for i in range(5)]
-        
         # Left Group
         cam_grp = tk.Frame(c, bg=COLORS['card'])
         cam_grp.pack(side="left")
@@ -159,7 +219,7 @@ class FaceAttendancePro:
         # Label 1
         tk.Label(cam_grp, text="PRIMARY CAMERA", font=("Segoe UI", 8, "bold"), bg=COLORS['card'], fg=COLORS['text_dim']).pack(anchor="w")
         self.camera_source_1 = tk.StringVar(value="Channel 1")
-        self.cam_combo_1 = ttk.Combobox(cam_grp, textvariable=self.camera_source_1, values=cam_options, width=18)
+        self.cam_combo_1 = ttk.Combobox(cam_grp, textvariable=self.camera_source_1, values=CAMERA_OPTIONS, width=18)
         self.cam_combo_1.pack(pady=(2,0))
         
         # Spacer
@@ -169,7 +229,7 @@ class FaceAttendancePro:
         cam_grp2 = tk.Frame(c, bg=COLORS['card']); cam_grp2.pack(side="left", padx=20)
         tk.Label(cam_grp2, text="SECONDARY CAMERA", font=("Segoe UI", 8, "bold"), bg=COLORS['card'], fg=COLORS['text_dim']).pack(anchor="w")
         self.camera_source_2 = tk.StringVar(value="Channel 2")
-        self.cam_combo_2 = ttk.Combobox(cam_grp2, textvariable=self.camera_source_2, values=cam_options, width=18)
+        self.cam_combo_2 = ttk.Combobox(cam_grp2, textvariable=self.camera_source_2, values=CAMERA_OPTIONS, width=18)
         self.cam_combo_2.pack(pady=(2,0))
         
         self.btn_cam_toggle = ModernButton(c, text="START CAMERAS", command=self.toggle_camera, bg=COLORS['accent'], fg="#0f172a", width=15); self.btn_cam_toggle.pack(side="right")
@@ -245,7 +305,6 @@ class FaceAttendancePro:
         self.entry_shift_end.delete(0, 'end'); self.entry_shift_end.insert(0, "18:00")
         
         self.reg_video_label.configure(image='', text="No Image Captured")
-        self.reg_video_label.imgtk = None
 
     def setup_records(self):
         tk.Label(self.frame_records, text="Records & Reports", font=("Segoe UI", 22, "bold"), bg=COLORS['bg'], fg=COLORS['text']).pack(anchor="w", pady=(0, 15))
@@ -309,7 +368,8 @@ class FaceAttendancePro:
         # Buttons
         btn_grp = tk.Frame(controls, bg=COLORS['card']); btn_grp.pack(side="right", anchor="s")
         ModernButton(btn_grp, text="DOWNLOAD CSV", command=lambda: self.generate_report("csv"), bg=COLORS['success'], fg="#0f172a", width=15).pack(side="right")
-        ModernButton(btn_grp, text="DOWNLOAD PDF", command=lambda: self.generate_report("pdf"), bg=COLORS['danger'], fg="#0f172a", width=15).pack(side="right", padx=10)
+        self.btn_pdf = ModernButton(btn_grp, text="DOWNLOAD PDF", command=lambda: self.generate_report("pdf"), bg=COLORS['danger'], fg="#0f172a", width=15)
+        self.btn_pdf.pack(side="right", padx=10)
 
         style = ttk.Style(); style.theme_use("clam")
         
@@ -335,20 +395,25 @@ class FaceAttendancePro:
         # We will use tags for alternating colors in load_records.
         style.map("Treeview", background=[('selected', COLORS['accent'])], foreground=[('selected', '#0f172a')])
 
-        self.tree = ttk.Treeview(self.frame_records, show="headings", selectmode="browse")
-        self.tree.pack(fill="both", expand=True, pady=5)
-        
-        # Configure tags for striped rows
-        self.tree.tag_configure('odd', background=COLORS['card'])
-        self.tree.tag_configure('even', background=COLORS['hover']) # Slightly lighter/different for striping
+        # One Treeview per view mode; switching views only swaps which one is packed
+        self.trees = {}
+        for mode, cols in RECORD_COLUMNS.items():
+            # The edit view allows multi-select so several persons can be deleted at once
+            tree = ttk.Treeview(self.frame_records, show="headings", selectmode="extended" if mode == "edit" else "browse", columns=cols)
+            for col in cols: tree.heading(col, text=col); tree.column(col, width=120)
+            
+            # Configure tags for striped rows
+            tree.tag_configure('odd', background=COLORS['card'])
+            tree.tag_configure('even', background=COLORS['hover']) # Slightly lighter/different for striping
+            self.trees[mode] = tree
+        self.tree = None
 
         
         
         
         # Date Range
         
-        self.update_report_dates(None) # Init dates
-        self.switch_record_view("summary")
+        self.update_report_dates(None) # Init dates (switch_frame then loads the summary view)
 
 
 
@@ -359,21 +424,20 @@ class FaceAttendancePro:
         
         if mode == "summary":
             self.btn_summary.configure(bg=COLORS['accent'], fg="#1e1e2e")
-            cols = ("ID", "Name", "Login", "Logout", "Status")
         elif mode == "logs":
             self.btn_logs.configure(bg=COLORS['accent'], fg="#1e1e2e")
-            cols = ("ID", "Name", "Date", "Time")
         elif mode == "edit":
             self.btn_edit.configure(bg=COLORS['accent'], fg="#1e1e2e")
-            cols = ("ID", "Name", "Email", "Dept", "Shift Start", "Shift End")
             self.btn_edit_sel.pack(side="left", padx=5); self.btn_del_sel.pack(side="left", padx=5)
         
-        self.tree["columns"] = cols
-        for col in cols: self.tree.heading(col, text=col); self.tree.column(col, width=120)
+        if self.tree is not self.trees[mode]:
+            if self.tree is not None: self.tree.pack_forget()
+            self.tree = self.trees[mode]
+            self.tree.pack(fill="both", expand=True, pady=5)
         self.load_records()
 
     def load_records(self):
-        for item in self.tree.get_children(): self.tree.delete(item)
+        self.tree.delete(*self.tree.get_children())  # One Tcl call, not one per row
         
         if self.record_view_mode == "summary": recs = self.db.get_today_attendance()
         elif self.record_view_mode == "logs": recs = self.db.get_recent_logs()
@@ -387,28 +451,8 @@ class FaceAttendancePro:
             count += 1
 
     def toggle_camera(self):
-        if self.is_running:
-            self.is_running = False
-            self.threads_running = False # Stop background threads
-            
-            # Wait for threads to join (non-blocking in UI, but good practice to allow cleanup)
-            # In a real GUI we might not want to block here, but for safety:
-            for t in self.processing_threads:
-                if t.is_alive(): t.join(timeout=0.2)
-            self.processing_threads = []
-
-            for cap in self.caps:
-                if cap is not None: cap.release()
-            self.caps = []
-            
-            self.video_label_1.config(image="", text="Camera 1 Off")
-            self.video_label_2.config(image="", text="Camera 2 Off")
-            self.cam_combo_1['state'] = 'readonly'
-            self.cam_combo_2['state'] = 'readonly'
-            self.btn_cam_toggle.config(text="START CAMERAS", bg=COLORS['accent'])
-            self.btn_pause.config(state="disabled", text="PAUSE", bg=COLORS['warning']) # Reset pause button
-            self.is_paused = False
-            self.lbl_status.config(text="SYSTEM OFFLINE", fg=COLORS['danger'])
+        if self.is_running.is_set():
+            self.stop_cameras()
         else:
             print(f"Connecting Cameras...")
             # Try to connect to Camera 0 and Camera 1
@@ -444,82 +488,106 @@ class FaceAttendancePro:
                     print(f"Error parsing source '{selection_str}': {e}")
                     return None
 
-            # Camera 1
+            # Open both cameras at once: driver init / RTSP handshake takes
+            # ~1 s per source, so the waits overlap instead of adding up
             val1 = self.camera_source_1.get()
-            cap1 = get_source_from_selection(val1)
+            val2 = self.camera_source_2.get()
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                cap1, cap2 = pool.map(get_source_from_selection, (val1, val2))
             
+            # Camera 1
             if cap1 and cap1.isOpened(): self.caps.append(cap1)
             else: self.caps.append(None); print(f"Camera Source 1 ({val1}) failed")
             
             # Camera 2
-            val2 = self.camera_source_2.get()
-            cap2 = get_source_from_selection(val2)
-            
             if cap2 and cap2.isOpened(): self.caps.append(cap2)
             else: self.caps.append(None); print(f"Camera Source 2 ({val2}) failed")
 
             if all(c is None for c in self.caps):
                 messagebox.showerror("Error", "No cameras found"); return
 
-            self.is_running = True
+            self.is_running.set()
             
             # Start background processing threads
             self.threads_running = True
             self.latest_results = {0: None, 1: None}
+            self.camera_session += 1
             
             for i in range(len(self.caps)):
                 if self.caps[i]:
-                    t = threading.Thread(target=self.background_processing_loop, args=(i,))
+                    t = threading.Thread(target=self.background_processing_loop, args=(i, self.caps[i], self.camera_session))
                     t.daemon = True
                     t.start()
                     self.processing_threads.append(t)
 
-            self.cam_combo_1['state'] = 'disabled'
-            self.cam_combo_2['state'] = 'disabled'
+            for combo in (self.cam_combo_1, self.cam_combo_2): combo.configure(state='disabled')
             self.btn_cam_toggle.config(text="STOP CAMERAS", bg=COLORS['danger'])
             self.btn_pause.config(state="normal") # Enable pause button
             self.lbl_status.config(text="SYSTEM ONLINE", fg=COLORS['success'])
             self.update_video_loop()
 
-    def background_processing_loop(self, cam_index):
+    def stop_cameras(self, defer_release=False):
+        """Stop the feed, join the workers and release both cameras.
+        With defer_release the joins and releases run just after via after()"""
+        self.is_running.clear()
+        self.threads_running = False # Stop background threads
+        
+        # Detach this session's cameras and workers, so a session started
+        # before a deferred release runs is never the one released
+        caps, self.caps = self.caps, []
+        threads, self.processing_threads = self.processing_threads, []
+        if defer_release:
+            self.root.after(50, self._release_cameras, caps, threads)
+        else:
+            self._release_cameras(caps, threads)
+        
+        self.video_label_1.config(image="", text="Camera 1 Off")
+        self.video_label_2.config(image="", text="Camera 2 Off")
+        for combo in (self.cam_combo_1, self.cam_combo_2): combo.configure(state='readonly')
+        self.btn_cam_toggle.config(text="START CAMERAS", bg=COLORS['accent'])
+        self.btn_pause.config(state="disabled", text="PAUSE", bg=COLORS['warning']) # Reset pause button
+        self.is_paused = False
+        self.lbl_status.config(text="SYSTEM OFFLINE", fg=COLORS['danger'])
+
+    def _release_cameras(self, caps, threads):
+        """Join the given workers and release the given cameras"""
+        # Wait for threads to join (non-blocking in UI, but good practice to allow cleanup)
+        # In a real GUI we might not want to block here, but for safety:
+        for t in threads:
+            if t.is_alive(): t.join(timeout=0.2)
+
+        for cap in caps:
+            if cap is not None: cap.release()
+
+    def background_processing_loop(self, cam_index, cap, session):
         """Background thread to run heavy face recognition"""
         # Select processor
         processor = self.processor if cam_index == 0 else self.processor2
-        cap = self.caps[cam_index]
         
-        frame_count = 0
-        SKIP_FRAMES = 4 # Process 1 out of 5 frames (CPU Optimization)
-        last_results = None # Memory for skipped frames
+        last_frame = None
         
-        while self.threads_running and self.is_running:
+        # A quick stop/start leaves the flags set again; the session check
+        # makes this worker exit instead of running alongside the new one
+        while self.threads_running and self.is_running.is_set() and self.camera_session == session:
             if cap is None: break
             
-            # Read latest frame
+            # Read latest frame (ThreadedCamera returns the same array until
+            # a new frame arrives; only new frames count towards the cadence)
             ret, frame = cap.read()
-            if not ret or frame is None:
-                time.sleep(0.01)
+            if not ret or frame is None or frame is last_frame:
+                time.sleep(0.005)
                 continue
+            last_frame = frame
             
-            # Run Heavy Processing or Skip
+            # Run Processing: the processor itself only detects on every
+            # detect_every-th frame and reuses tracked boxes in between
             # Returns: (detections, labels, faces, messages)
             try:
-                frame_count += 1
-                
-                # LOGIC: Process only every (SKIP_FRAMES + 1)th frame
-                if frame_count % (SKIP_FRAMES + 1) == 0:
-                    detections, labels, faces, messages = processor.process_frame(
-                        frame, 
-                        mark_attendance_callback=self.tracker.process_recognized_face,
-                        unknown_person_callback=self.tracker.process_unknown_person
-                    )
-                    last_results = (detections, labels, faces)
-                else:
-                    # Skip frame: use last known results (or empty if None)
-                    if last_results:
-                        detections, labels, faces = last_results
-                    else:
-                        detections, labels, faces = [], [], []
-                    messages = []
+                detections, labels, faces, messages = processor.process_frame(
+                    frame, 
+                    mark_attendance_callback=self.tracker.process_recognized_face,
+                    unknown_person_callback=self.tracker.process_unknown_person
+                )
 
                 # Queue messages for main thread
                 for msg in messages:
@@ -527,7 +595,8 @@ class FaceAttendancePro:
                 
                 # Store visualization data safely
                 with self.processing_lock:
-                    self.latest_results[cam_index] = (detections, labels, faces)
+                    if self.camera_session == session:
+                        self.latest_results[cam_index] = (detections, labels, faces)
             except Exception as e:
                 print(f"Processing Error Cam {cam_index}: {e}")
             
@@ -536,7 +605,7 @@ class FaceAttendancePro:
 
     def toggle_pause(self):
         """Toggle the pause state of the dashboard video feed"""
-        if not self.is_running: return
+        if not self.is_running.is_set(): return
         
         self.is_paused = not self.is_paused
         
@@ -548,10 +617,22 @@ class FaceAttendancePro:
             self.btn_pause.config(text="PAUSE", bg=COLORS['warning'])
 
     def update_video_loop(self):
-        if not self.is_running: return
+        if not self.is_running.is_set(): return
         
         # We only READ frames here for display. Processing happens in background.
         
+        # Flush Logs: one insert for everything queued since the last tick,
+        # then trim so the listbox never grows past LOG_LIST_MAX rows
+        new_rows = []
+        while not self.log_queue.empty():
+            try:
+                new_rows.append(self.log_queue.get_nowait())
+            except: break
+        if new_rows:
+            timestamp = datetime.now().strftime('%H:%M:%S')
+            self.log_list.insert(0, *(f"{timestamp} - {msg}" for msg in reversed(new_rows)))
+            self.log_list.delete(LOG_LIST_MAX, 'end')
+        
         for i, cap in enumerate(self.caps):
             if cap is None: continue
             
@@ -567,6 +648,13 @@ class FaceAttendancePro:
             with self.processing_lock:
                 results = self.latest_results.get(i)
             
+            # ThreadedCamera hands back the same array until a new frame is
+            # decoded: skip annotate/resize/blit when neither the frame nor
+            # the results changed since the last draw (or while paused)
+            if self.is_paused or (frame is self.last_shown[i][0] and results is self.last_shown[i][1]):
+                continue
+            self.last_shown[i] = (frame, results)
+            
             # 3. Annotate Frame (Fast drawing)
             annotated_frame = frame
             
@@ -576,34 +664,30 @@ class FaceAttendancePro:
                 # Use the processor's drawing method
                 processor = self.processor if i == 0 else self.processor2
                 annotated_frame = processor.annotate_frame(frame, detections, labels, faces)
-            
-            # Flush Logs
-            while not self.log_queue.empty():
-                try:
-                    msg = self.log_queue.get_nowait()
-                    self.log_list.insert(0, f"{datetime.now().strftime('%H:%M:%S')} - {msg}")
-                except: break
 
-            # 4. Display
             # 4. Display Optimized
-            if not self.is_paused:
-                # Resize using OpenCV (Much faster than PIL)
-                # target width=640, height=480 (standard VGA)
-                frame_resized = cv2.resize(annotated_frame, (640, 480), interpolation=cv2.INTER_LINEAR)
-                
-                # Convert to RGB for Tkinter
-                img = Image.fromarray(cv2.cvtColor(frame_resized, cv2.COLOR_BGR2RGB))
-                imgtk = ImageTk.PhotoImage(image=img)
-                
-                if i == 0:
-                    self.video_label_1.imgtk = imgtk
-                    self.video_label_1.configure(image=imgtk, text="")
-                elif i == 1:
-                    self.video_label_2.imgtk = imgtk
-                    self.video_label_2.configure(image=imgtk, text="")
-
-        # Update stats occasionally
-        if int(time.time())%2==0 and self.current_view == "dashboard": 
+            # Resize using OpenCV first (Much faster than PIL), so the
+            # colour conversion only touches the small frame
+            # target width=640, height=480 (standard VGA)
+            frame_resized = cv2.resize(annotated_frame, (640, 480), interpolation=cv2.INTER_LINEAR)
+            rgb = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2RGB)
+            
+            # Raw RGB behind a PPM header is read by Tk directly: no PIL
+            # image, and the PhotoImage is reused instead of recreated
+            ppm = b'P6\n%d %d\n255\n' % (rgb.shape[1], rgb.shape[0]) + rgb.tobytes()
+            photo = self.video_photos[i]
+            if photo is None:
+                photo = self.video_photos[i] = tk.PhotoImage(data=ppm, format='PPM')
+            else:
+                photo.configure(data=ppm, format='PPM')
+            
+            label = self.video_label_1 if i == 0 else self.video_label_2
+            label.configure(image=photo, text="")
+
+        # Update stats occasionally (every 2 s, not every tick of an even second)
+        now = time.time()
+        if now - self.last_stats_ts >= 2.0 and self.current_view == "dashboard": 
+            self.last_stats_ts = now
             try:
                 s = self.db.get_statistics()
                 self.card_total.config(text=str(s['total_persons'])); self.card_present.config(text=str(s['present_today']))
@@ -611,6 +695,21 @@ class FaceAttendancePro:
                 
         self.root.after(30, self.update_video_loop) # Target ~30 FPS
 
+    def show_registration_preview(self, img):
+        """Show img (BGR) in the registration preview, fitted into 400x300"""
+        h, w = img.shape[:2]
+        scale = min(400 / w, 300 / h, 1.0)
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        rgb = cv2.cvtColor(cv2.resize(img, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2RGB)
+        
+        # Same PPM path as the dashboard: the PhotoImage is created once
+        ppm = b'P6\n%d %d\n255\n' % size + rgb.tobytes()
+        if self.reg_photo is None:
+            self.reg_photo = tk.PhotoImage(data=ppm, format='PPM')
+        else:
+            self.reg_photo.configure(data=ppm, format='PPM')
+        self.reg_video_label.configure(image=self.reg_photo, text="")
+
     def perform_registration(self):
         pid = self.reg_entries["Person ID (Unique)"].get()
         name = self.reg_entries["Full Name"].get()
@@ -626,36 +725,36 @@ class FaceAttendancePro:
         print(f"Capturing registration photo from: {source}")
         
         try:
-            temp_cap = cv2.VideoCapture(source)
+            temp_cap = open_capture(source)
             if not temp_cap.isOpened():
                 # Fallback to local webcam if configured source fails
                 print("Configured source failed, trying default camera 0...")
-                temp_cap = cv2.VideoCapture(0)
+                temp_cap = open_capture(0)
         except Exception as e:
             print(f"Camera error: {e}")
-            temp_cap = cv2.VideoCapture(0)
+            temp_cap = open_capture(0)
             
         if not temp_cap.isOpened(): messagebox.showerror("Error", "Could not open camera"); return
         
-        # Read a few frames to let auto-exposure settle
-        for _ in range(10): 
-            ret, frame = temp_cap.read()
+        # Let auto-exposure settle for a fixed time rather than a frame count:
+        # grab() skips decoding, only the final frame is retrieved
+        deadline = time.time() + 0.4
+        while time.time() < deadline:
+            temp_cap.grab()
+        ret, frame = temp_cap.retrieve()
             
         temp_cap.release()
         if not ret: messagebox.showerror("Error", "Failed capture from source"); return
         img = frame
         
         # 2. Show Preview
-        prev = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-        prev.thumbnail((400, 300))
-        p_tk = ImageTk.PhotoImage(image=prev)
-        self.reg_video_label.imgtk = p_tk; self.reg_video_label.configure(image=p_tk, text="")
+        self.show_registration_preview(img)
 
         # 3. Extract & Save
         encoding, msg = self.face_handler.extract_face_encoding(img)
         if encoding is None: messagebox.showerror("Face Error", msg); return
         
-        self.face_handler.load_face_encodings()
+        # Duplicate check against the in-memory gallery (kept current by add_face_encoding)
         exist_id, _, sim = self.face_handler.recognize_face(encoding)
         if exist_id and sim > 0.5: messagebox.showerror("Duplicate", f"Matches {exist_id}"); return
 
@@ -678,15 +777,12 @@ class FaceAttendancePro:
         if img is None: messagebox.showerror("Error", "Read fail"); return
         
         # Preview
-        prev = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-        prev.thumbnail((400, 300))
-        p_tk = ImageTk.PhotoImage(image=prev)
-        self.reg_video_label.imgtk = p_tk; self.reg_video_label.configure(image=p_tk, text="")
+        self.show_registration_preview(img)
 
         encoding, msg = self.face_handler.extract_face_encoding(img)
         if encoding is None: messagebox.showerror("Face Error", msg); return
         
-        self.face_handler.load_face_encodings()
+        # Duplicate check against the in-memory gallery (kept current by add_face_encoding)
         exist_id, _, sim = self.face_handler.recognize_face(encoding)
         if exist_id and sim > 0.5: messagebox.showerror("Duplicate", f"Matches {exist_id}"); return
 
@@ -729,17 +825,21 @@ class FaceAttendancePro:
             ent = tk.Entry(popup, bg=COLORS['card'], fg="white", relief="flat"); ent.insert(0, str(curr[i])); ent.pack(fill="x", padx=40, pady=5); entries[lbl] = ent
         def save():
             if self.db.update_person(pid, entries["Name"].get(), entries["Email"].get(), entries["Department"].get(), entries["Shift Start"].get(), entries["Shift End"].get())[0]:
+                self.report_cache.clear()  # Reports show the person's name
                 messagebox.showinfo("OK", "Updated!"); self.load_records(); popup.destroy()
         ModernButton(popup, text="SAVE", command=save, bg=COLORS['success'], fg="#1e1e2e").pack(fill="x", padx=40, pady=30)
 
     def delete_selected_person(self):
         sel = self.tree.selection()
         if not sel: return
-        pid = str(self.tree.item(sel[0])['values'][0])
-        if messagebox.askyesno("Delete", "Delete person and logs?"):
-            if self.db.delete_person(pid)[0]:
-                self.face_handler.remove_face_encoding(pid)
-                self.processor.clear_cache()
+        pids = [str(self.tree.item(i)['values'][0]) for i in sel]
+        prompt = "Delete person and logs?" if len(pids) == 1 else f"Delete {len(pids)} persons and their logs?"
+        if messagebox.askyesno("Delete", prompt):
+            # One DELETE and one index rebuild for the whole selection
+            if self.db.delete_persons(pids)[0]:
+                self.face_handler.remove_face_encodings(pids)
+                self.processor.clear_cache(); self.processor2.clear_cache()
+                self.report_cache.clear()
                 messagebox.showinfo("OK", "Deleted")
                 self.load_records()
 
@@ -749,96 +849,168 @@ class FaceAttendancePro:
         """Auto-fill dates based on selection"""
         rtype = self.report_type.get()
         today = date.today()
-        start = today
-        end = today
-        
-        if rtype == "Daily":
-            start = today
-        elif rtype == "Weekly":
-            start = today - timedelta(days=today.weekday()) # Start of week (Mon)
-        elif rtype == "Monthly":
-            start = today.replace(day=1)
-        elif rtype == "Yearly":
-            start = today.replace(month=1, day=1)
+        starts = {
+            "Daily": today,
+            "Weekly": today - timedelta(days=today.weekday()), # Start of week (Mon)
+            "Monthly": today.replace(day=1),
+            "Yearly": today.replace(month=1, day=1),
+        }
+        start = starts.get(rtype, today)
             
-        # Update Entries
-        self.entry_date_start.delete(0, 'end'); self.entry_date_start.insert(0, start.strftime('%Y-%m-%d'))
-        self.entry_date_end.delete(0, 'end'); self.entry_date_end.insert(0, end.strftime('%Y-%m-%d'))
+        # Update Entries (ranges always end today)
+        self.entry_date_start.delete(0, 'end'); self.entry_date_start.insert(0, start.isoformat())
+        self.entry_date_end.delete(0, 'end'); self.entry_date_end.insert(0, today.isoformat())
         
         # Enable/Disable based on Custom
         state = "normal" if rtype == "Custom" else "disabled"
 
+    def cache_report(self, key, rows):
+        """Remember a finished report range (oldest entry evicted first)"""
+        if len(rows) > REPORT_CACHE_MAX_ROWS: return
+        self.report_cache[key] = rows
+        if len(self.report_cache) > REPORT_CACHE_SIZE:
+            del self.report_cache[next(iter(self.report_cache))]
+
     def generate_report(self, fmt):
         start = self.entry_date_start.get()
         end = self.entry_date_end.get()
         pid = self.entry_report_id.get().strip()
         if not pid: pid = "All"
         
-        # Fetch Data
-        data = self.db.get_attendance_report(start, end, pid)
+        # Parse the entries once: a bad date is reported here instead of as a
+        # SQL error, and the query binds real DATE values
+        try:
+            start_day = datetime.strptime(start, '%Y-%m-%d').date()
+            end_day = datetime.strptime(end, '%Y-%m-%d').date()
+        except ValueError:
+            messagebox.showerror("Error", "Dates must be in YYYY-MM-DD format."); return
+        start, end = start_day.isoformat(), end_day.isoformat()  # Normalized for names / cache keys
+        
+        # Fetch Data (streamed batch by batch into the CSV / PDF writer).
+        # Ranges that ended before today no longer change, so exporting the
+        # same one again (e.g. CSV, then PDF) reuses the rows already fetched
+        key = (start, end, pid)
+        cacheable = end_day < date.today()
+        batches = iter(())
+        if key in self.report_cache:
+            data = self.report_cache[key]
+        else:
+            batches = self.db.iter_attendance_report(start_day, end_day, pid)
+            data = next(batches, None)
         if not data:
             messagebox.showinfo("Report", "No records found for this period.")
             return
 
-        # Create Reports Directory
-        today_str = datetime.now().strftime('%Y-%m-%d')
+        # Create Reports Directory (once per day per session)
+        now = datetime.now()
+        today_str = now.strftime('%Y-%m-%d')
         # Updated path for reports
         report_dir = os.path.join("data", "reports", today_str)
         
-        if not os.path.exists(report_dir):
+        if report_dir not in self.report_dirs_made:
             try:
-                os.makedirs(report_dir)
+                os.makedirs(report_dir, exist_ok=True)
             except OSError as e:
+                if hasattr(batches, 'close'): batches.close()
                 messagebox.showerror("Error", f"Could not create report directory: {e}")
                 return
+            self.report_dirs_made.add(report_dir)
 
         # Generate File
-        timestamp = datetime.now().strftime('%H%M%S')
+        timestamp = now.strftime('%H%M%S')
         filename = f"Report_{pid}_{start}_to_{end}_{timestamp}"
         full_path = os.path.join(report_dir, filename)
         
         if fmt == "csv":
             full_path += ".csv"
             try:
-                with open(full_path, 'w', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(['Date', 'Name', 'ID', 'Arrival', 'Leaving', 'Status'])
-                    writer.writerows(data)
+                # Same bytes as csv.writer, but one write per batch
+                with open(full_path, 'w', newline='', encoding='utf-8', buffering=1 << 20) as f:
+                    f.write("Date,Name,ID,Arrival,Leaving,Status\r\n")
+                    f.write(_report_csv_lines(data))
+                    kept = list(data) if cacheable and key not in self.report_cache else None
+                    for batch in batches:
+                        f.write(_report_csv_lines(batch))
+                        if kept is not None:
+                            kept.extend(batch)
+                            if len(kept) > REPORT_CACHE_MAX_ROWS: kept = None
+                if kept is not None: self.cache_report(key, kept)
                 messagebox.showinfo("Success", f"Saved: {full_path}")
-                try: os.startfile(report_dir)
-                except: pass
+                _open_folder(report_dir)
             except Exception as e:
                 messagebox.showerror("Error", str(e))
                 
         elif fmt == "pdf":
             full_path += ".pdf"
-            success, msg = self.db.export_to_pdf(data, full_path, title=f"Attendance Report ({start} to {end})")
-            if success: 
-                messagebox.showinfo("Success", f"Saved: {full_path}")
-                try: os.startfile(report_dir)
-                except: pass
-            else: messagebox.showerror("Error", msg)
+            
+            # ReportLab layout can take seconds: render on a worker thread and
+            # poll for the result from the Tk thread (button disabled meanwhile;
+            # like log_queue, the worker never calls into Tk itself)
+            result = []
+            def render():
+                rows = itertools.chain(data, itertools.chain.from_iterable(batches))
+                result.append(self.db.export_to_pdf(rows, full_path, title=f"Attendance Report ({start} to {end})"))
+            
+            def finish():
+                if not result: self.root.after(100, finish); return
+                success, msg = result[0]
+                self.btn_pdf.config(state="normal")
+                if success: 
+                    messagebox.showinfo("Success", f"Saved: {full_path}")
+                    _open_folder(report_dir)
+                else: messagebox.showerror("Error", msg)
+            
+            self.btn_pdf.config(state="disabled")
+            threading.Thread(target=render, daemon=True).start()
+            self.root.after(100, finish)
 
     def animate_pulse(self):
-        t = time.time() * 5; h = f"#{int(100+50*math.sin(t)):02x}ff{int(100+50*math.sin(t)):02x}"
-        if self.is_running: self.canvas_pulse.itemconfig(self.pulse_circle, fill=h)
-        else: self.canvas_pulse.itemconfig(self.pulse_circle, fill=COLORS['danger'])
-        self.root.after(100, self.animate_pulse)
-
-    def close_app(self): self.is_running = False; self.root.destroy()
-
-    def show_dashboard(self): self.switch_frame(self.frame_dashboard, "dashboard")
+        # Off the dashboard: stop until show_dashboard re-arms it
+        if self.current_view != "dashboard": self.pulse_after = None; return
+        
+        if self.is_running.is_set():
+            h = PULSE_COLORS[self.pulse_idx]; self.pulse_idx = (self.pulse_idx + 1) % len(PULSE_COLORS)
+            self.set_pulse_fill(h)
+            self.pulse_after = self.root.after(100, self.animate_pulse)
+        else:
+            # Static colour while offline: just check back for a camera start
+            self.set_pulse_fill(COLORS['danger'])
+            self.pulse_after = self.root.after(500, self.animate_pulse)
+
+    def set_pulse_fill(self, fill):
+        """Recolour the pulse, skipping the Tcl call when nothing changes"""
+        if fill != self.pulse_fill:
+            self.canvas_pulse.itemconfig(self.pulse_circle, fill=fill)
+            self.pulse_fill = fill
+
+    def close_app(self):
+        self.is_running.clear()
+        if self.pulse_after is not None: self.root.after_cancel(self.pulse_after)
+        self.root.destroy()
+
+    def show_dashboard(self):
+        self.switch_frame(self.frame_dashboard, "dashboard")
+        if self.pulse_after is None: self.animate_pulse()
     
     def show_registration(self):
-        # Force stop camera when entering registration so button can take over
-        if self.is_running: self.toggle_camera()
+        # Force stop camera when entering registration so button can take over.
+        # Clearing the flag stops the feed and workers at once; the joins and
+        # camera release run just after the registration frame is shown
+        if self.is_running.is_set():
+            self.stop_cameras(defer_release=True)
         self.switch_frame(self.frame_register, "register")
         
     def show_records(self): self.switch_frame(self.frame_records, "records")
 
     def switch_frame(self, frame, name):
-        self.frame_dashboard.pack_forget(); self.frame_register.pack_forget(); self.frame_records.pack_forget()
-        frame.pack(fill="both", expand=True); self.current_view = name
+        if name not in self.built_views:
+            if name == "register": self.setup_registration()
+            elif name == "records": self.setup_records()
+            self.built_views.add(name)
+        # Only swap frames on an actual change (re-clicking Records still refreshes it)
+        if name != self.current_view:
+            if self.current_view is not None: self.view_frames[self.current_view].pack_forget()
+            frame.pack(fill="both", expand=True); self.current_view = name
         if name == "records": self.switch_record_view("summary")
 
 if __name__ == "__main__":